@@ -1,20 +1,26 @@
-from langchain_openai import ChatOpenAI
-from langgraph.prebuilt import create_react_agent
-from app.tools import all_tools
+import threading
 
 SYSTEM_PROMPT = """You are the CNII Sentinel AI, a specialized assistant for monitoring fiber optic infrastructure risks in Nigeria.
 
 Your capabilities:
-1. **Patrol Sweep:** You can scan critical zones for risks using the `perform_patrol_sweep` tool.
-2. **Risk Analysis:** You can explain specific threats found in the reports.
+1. **Stored Intelligence (fast):** `get_latest_risks`, `get_risks_above_score`, `get_risk_history_summary` and `check_data_freshness` read the saved patrol reports in well under a second.
+2. **Patrol Sweep (slow):** You can scan critical zones for risks using the `perform_patrol_sweep` tool. A live sweep takes minutes.
+3. **Risk Analysis:** You can explain specific threats found in the reports.
 
 Guidelines:
-- When asked to "run a patrol" or "scan for risks", ALWAYS use the `perform_patrol_sweep` tool.
+- ALWAYS answer questions about risks, zones, scores or trends from the stored-intelligence tools first, and say when the data was collected.
+- Only run `perform_patrol_sweep` when the user explicitly asks for a new patrol/scan, or when the stored data is marked stale. Set `force=true` only when the user insists on a fresh sweep despite recent data.
 - Be professional, concise, and focused on infrastructure safety.
 """
 
 def create_sentinel_agent():
     """Create the LangGraph agent."""
+    # Imported here: LangChain/LangGraph dominate import time, so the API
+    # process only loads them when the agent is first needed
+    from langchain_openai import ChatOpenAI
+    from langgraph.prebuilt import create_react_agent
+    from app.agent_tools import all_tools
+
     llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
     
     agent = create_react_agent(
@@ -24,5 +30,14 @@ def create_sentinel_agent():
     )
     return agent
 
-# Singleton instance
-agent = create_sentinel_agent()
\ No newline at end of file
+# Singleton instance, built on first use (or by the API's warm-up task)
+_agent = None
+_agent_lock = threading.Lock()
+
+def get_agent():
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = create_sentinel_agent()
+    return _agent
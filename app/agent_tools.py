@@ -0,0 +1,132 @@
+import datetime
+import os
+from typing import List, Optional
+from langchain_core.tools import tool
+
+from app.jobs import count_active_runs, request_sweep
+from app.queries import fetch_risk_page, summarize_risk_history
+from app.report_cache import cached_latest_report
+from app.schemas import InfrastructureRisk, PatrolResponse
+from app.zones import known_zone_names
+
+# Tools exposed to the chat agent. Kept apart from app.tools so the sweep
+# engine (and the API process) don't import LangChain until the agent is built.
+
+# Stored data older than this makes a live sweep worthwhile
+CHAT_MAX_DATA_AGE_HOURS = float(os.getenv("CHAT_MAX_DATA_AGE_HOURS", "24"))
+# Caps each tool result so the model gets a small, fast-to-read payload
+CHAT_MAX_RISKS = int(os.getenv("CHAT_MAX_RISKS", "20"))
+
+
+def resolve_zone(zone: Optional[str]) -> Optional[str]:
+    """Maps a partial name ("Lekki-Epe") to the stored zone name when it is unambiguous."""
+    if not zone:
+        return None
+    matches = [name for name in known_zone_names() if zone.strip().lower() in name.lower()]
+    return matches[0] if len(matches) == 1 else zone.strip()
+
+
+def _matches_zone(risk: InfrastructureRisk, zone: str) -> bool:
+    needle = zone.strip().lower()
+    return needle in (risk.zone or "").lower() or needle in (risk.location_identified or "").lower()
+
+
+def _compact(risk: InfrastructureRisk) -> dict:
+    return risk.model_dump(mode="json", exclude={"latitude", "longitude"}, exclude_none=True)
+
+
+async def _latest_report() -> Optional[PatrolResponse]:
+    # Same in-process cache that serves /patrol/latest
+    cached = await cached_latest_report()
+    return PatrolResponse.model_validate_json(cached[0]) if cached else None
+
+
+def _freshness(report: Optional[PatrolResponse]) -> dict:
+    if report is None or report.timestamp is None:
+        return {"report_time": None, "age_hours": None, "stale": True}
+    age = (datetime.datetime.utcnow() - report.timestamp).total_seconds() / 3600
+    return {
+        "report_time": report.timestamp.isoformat() + "Z",
+        "age_hours": round(age, 2),
+        "stale": age > CHAT_MAX_DATA_AGE_HOURS,
+    }
+
+
+def _risk_list(risks: List[InfrastructureRisk]) -> dict:
+    return {"total": len(risks), "risks": [_compact(r) for r in risks[:CHAT_MAX_RISKS]]}
+
+
+@tool
+async def get_latest_risks(zone: Optional[str] = None) -> dict:
+    """
+    Risks from the most recent stored patrol report, highest priority first.
+    Optionally filter by zone or place name (e.g. "Lekki-Epe", "Abuja").
+    Fast: use this first for any question about current risks.
+    """
+    report = await _latest_report()
+    if report is None:
+        return {"error": "No patrol report has been stored yet.", "stale": True}
+    risks = [r for r in report.risks if _matches_zone(r, zone)] if zone else report.risks
+    return {"summary": report.summary, **_freshness(report), **_risk_list(risks)}
+
+
+@tool
+async def get_risks_above_score(min_score: int = 7, days: int = 30, zone: Optional[str] = None) -> dict:
+    """
+    Stored risks scored at least min_score (0-10) in the last `days` days,
+    newest first, optionally for one zone.
+    """
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=max(1, days))
+    page = await fetch_risk_page(CHAT_MAX_RISKS, zone=resolve_zone(zone), min_score=min_score, since=since)
+    return {
+        "risks": [item.model_dump(mode="json", exclude_none=True) for item in page.items],
+        "more_available": page.next_cursor is not None,
+    }
+
+
+@tool
+async def get_risk_history_summary(days: int = 30, zone: Optional[str] = None) -> dict:
+    """
+    Trend overview for the last `days` days: number of patrols, new risks per
+    zone and risk level, highest score per zone, and the most common threat types.
+    """
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=max(1, days))
+    return await summarize_risk_history(since, zone=resolve_zone(zone))
+
+
+@tool
+async def check_data_freshness() -> dict:
+    """When the last patrol report was saved, whether it is stale, and whether a sweep is already running."""
+    report = await _latest_report()
+    return {
+        **_freshness(report),
+        "max_age_hours": CHAT_MAX_DATA_AGE_HOURS,
+        "sweeps_in_progress": await count_active_runs(),
+    }
+
+
+@tool
+async def perform_patrol_sweep(extra_zone: Optional[str] = None, force: bool = False) -> dict:
+    """
+    Scans critical infrastructure zones using Tavily search and cleans article content 
+    with Jina Reader to identify fiber optic risks in Nigeria.
+    Slow (minutes). Unless force is True, a stored report that is still fresh is
+    returned instead of running a new sweep.
+    """
+    if not force and resolve_zone(extra_zone) in (None, *known_zone_names()):
+        report = await _latest_report()
+        freshness = _freshness(report)
+        if not freshness["stale"]:
+            return {"summary": report.summary, "served_from": "stored report", **freshness, **_risk_list(report.risks)}
+
+    result = await request_sweep("agent", extra_zone)
+    return {"summary": result.summary, "served_from": "live sweep", **_risk_list(result.risks)}
+
+# Export tools list for the agent (read-only tools first: the model prefers them)
+all_tools = [
+    get_latest_risks,
+    get_risks_above_score,
+    get_risk_history_summary,
+    check_data_freshness,
+    perform_patrol_sweep,
+]
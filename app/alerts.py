@@ -0,0 +1,215 @@
+import asyncio
+import hashlib
+import os
+import random
+import time
+from typing import Dict, List, NamedTuple, Optional, Set
+
+import httpx
+
+from app.cache import PersistentCache
+from app.http_client import get_http_client
+from app.metrics import observe_stage
+
+# --- Settings ---
+TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+CHAT_ID = os.getenv("CHAT_ID")
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+# Risks at or above this score are alerted
+ALERT_MIN_SCORE = int(os.getenv("ALERT_MIN_SCORE", "7"))
+# Telegram allows ~1 message/second per chat (20/minute in groups)
+TELEGRAM_MIN_INTERVAL = float(os.getenv("TELEGRAM_MIN_INTERVAL", "1.1"))
+# A sweep's alerts are held at most this long before a digest goes out, even mid-sweep
+ALERT_MAX_DELAY = float(os.getenv("ALERT_MAX_DELAY", "30"))
+# Risks per digest message (keeps messages well under Telegram's 4096-character limit)
+ALERT_DIGEST_SIZE = int(os.getenv("ALERT_DIGEST_SIZE", "8"))
+ALERT_MAX_RETRIES = int(os.getenv("ALERT_MAX_RETRIES", "5"))
+ALERT_BACKOFF_BASE = float(os.getenv("ALERT_BACKOFF_BASE", "1"))
+ALERT_BACKOFF_MAX = float(os.getenv("ALERT_BACKOFF_MAX", "60"))
+# The same source + location is alerted once per this window
+ALERT_DEDUP_TTL = int(os.getenv("ALERT_DEDUP_TTL", str(7 * 24 * 3600)))
+
+DASHBOARD_URL = "https://ai-sentinel-eye.web.app"
+
+sent_alerts = PersistentCache("alerts", default_ttl=ALERT_DEDUP_TTL)
+
+
+class Alert(NamedTuple):
+    key: str
+    risk_level: str
+    location: str
+    summary: str
+    source_url: Optional[str]
+
+
+def alert_key(source_url: Optional[str], location: Optional[str]) -> str:
+    raw = f"{(source_url or '').strip()}|{' '.join((location or '').lower().split())}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def format_alert(alert: Alert) -> str:
+    return (
+        f"🚨 *SENTINEL HIGH-PRIORITY ALERT*\n\n"
+        f"📍 *Location:* {alert.location}\n"
+        f"⚠️ *Risk:* {alert.risk_level}\n"
+        f"📝 *Summary:* {alert.summary}\n\n"
+        f"🔗 [Open Dashboard]({DASHBOARD_URL})"
+    )
+
+
+def format_digest(alerts: List[Alert]) -> str:
+    if len(alerts) == 1:
+        return format_alert(alerts[0])
+    lines = [f"🚨 *SENTINEL HIGH-PRIORITY ALERTS* ({len(alerts)})\n"]
+    for i, alert in enumerate(alerts, 1):
+        lines.append(f"*{i}.* 📍 *{alert.location}* — ⚠️ {alert.risk_level}\n📝 {alert.summary}\n")
+    lines.append(f"🔗 [Open Dashboard]({DASHBOARD_URL})")
+    return "\n".join(lines)
+
+
+class AlertDispatcher:
+    """
+    Sends Telegram alerts off the sweep's critical path. Sweeps only call
+    enqueue(); one background consumer groups each sweep's alerts into digest
+    messages, paces them to Telegram's per-chat limit, retries with exponential
+    backoff (honouring 429 retry_after) and skips source/location pairs that
+    were already alerted.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: Set[str] = set()
+        self._next_send = 0.0
+        self._warned = False
+
+    def _ensure_started(self) -> None:
+        # Started lazily on the running loop: the web app, the worker and scripts all work
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._consume())
+
+    def enqueue(self, risk, batch: Optional[str] = None) -> bool:
+        """Queues an alert for a risk; returns False if it is a duplicate or alerts are off."""
+        if not TELEGRAM_TOKEN or not CHAT_ID:
+            if not self._warned:
+                print("⚠️ TELEGRAM_TOKEN/CHAT_ID not set; alerts are disabled.")
+                self._warned = True
+            return False
+        key = alert_key(risk.source_url, risk.location_identified)
+        if key in self._pending or sent_alerts.get(key):
+            return False
+        self._pending.add(key)
+        self._ensure_started()
+        alert = Alert(key, f"{risk.risk_score}/10", risk.location_identified, risk.summary, risk.source_url)
+        self._queue.put_nowait(("alert", batch, alert))
+        return True
+
+    def close_batch(self, batch: str) -> None:
+        """Marks a sweep's alerts complete so its digest goes out without waiting."""
+        if self._queue is not None:
+            self._queue.put_nowait(("close", batch, None))
+
+    async def stop(self, timeout: float = 10) -> None:
+        """Flushes whatever is buffered, then stops the consumer."""
+        if self._task is None or self._task.done():
+            return
+        self._queue.put_nowait(("stop", None, None))
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            print("⚠️ Alert dispatcher stopped with alerts still unsent.")
+
+    async def _consume(self) -> None:
+        buffers: Dict[Optional[str], List[Alert]] = {}
+        opened: Dict[Optional[str], float] = {}
+        while True:
+            timeout = None
+            if opened:
+                timeout = max(0.0, min(opened.values()) + ALERT_MAX_DELAY - time.monotonic())
+            try:
+                kind, batch, alert = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                kind, batch, alert = "due", None, None
+
+            ready = []
+            if kind == "alert":
+                buffers.setdefault(batch, []).append(alert)
+                opened.setdefault(batch, time.monotonic())
+                # Alerts outside any sweep, or a full digest, go out right away
+                if batch is None or len(buffers[batch]) >= ALERT_DIGEST_SIZE:
+                    ready.append(batch)
+            elif kind == "close":
+                ready.append(batch)
+            elif kind == "due":
+                now = time.monotonic()
+                ready += [b for b, t in opened.items() if now - t >= ALERT_MAX_DELAY]
+            elif kind == "stop":
+                ready += list(buffers)
+
+            for b in ready:
+                alerts = buffers.pop(b, [])
+                opened.pop(b, None)
+                if alerts:
+                    await self._send_digest(alerts)
+            if kind == "stop":
+                return
+
+    async def _send_digest(self, alerts: List[Alert]) -> None:
+        try:
+            delivered = await self._deliver(format_digest(alerts))
+        except Exception as e:
+            print(f"❌ Telegram Error: {e}")
+            delivered = False
+        for alert in alerts:
+            self._pending.discard(alert.key)
+            if delivered:
+                sent_alerts.set(alert.key, True)
+        if delivered:
+            print(f"✅ Telegram Alert Sent to {CHAT_ID} ({len(alerts)} risk(s))")
+
+    async def _pace(self) -> None:
+        wait = self._next_send - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._next_send = time.monotonic() + TELEGRAM_MIN_INTERVAL
+
+    async def _deliver(self, text: str) -> bool:
+        url = f"{TELEGRAM_API_BASE}/bot{TELEGRAM_TOKEN}/sendMessage"
+        payload = {"chat_id": CHAT_ID, "text": text, "parse_mode": "Markdown"}
+        for attempt in range(ALERT_MAX_RETRIES + 1):
+            await self._pace()
+            delay = min(ALERT_BACKOFF_MAX, ALERT_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.8, 1.2)
+            try:
+                with observe_stage("telegram") as stage:
+                    response = await get_http_client().post(url, data=payload)
+                    if response.status_code != 200:
+                        stage.fail()
+            except httpx.HTTPError as e:
+                print(f"⚠️ Telegram unreachable ({e}); retry {attempt + 1}/{ALERT_MAX_RETRIES} in {delay:.1f} s")
+            else:
+                if response.status_code == 200:
+                    return True
+                if response.status_code == 429:
+                    # Telegram says exactly how long to back off
+                    try:
+                        delay = float(response.json().get("parameters", {}).get("retry_after", delay))
+                    except ValueError:
+                        pass
+                    self._next_send = time.monotonic() + delay
+                    print(f"⏳ Telegram rate limit; retrying in {delay:.0f} s")
+                    continue  # _pace() waits out retry_after
+                elif response.status_code < 500:
+                    # Bad token/chat/markup: retrying will not help
+                    print(f"❌ Telegram Error: {response.status_code} - {response.text}")
+                    return False
+                else:
+                    print(f"⚠️ Telegram Error: {response.status_code}; retry {attempt + 1}/{ALERT_MAX_RETRIES} in {delay:.1f} s")
+            if attempt < ALERT_MAX_RETRIES:
+                await asyncio.sleep(delay)
+        print("❌ Telegram alert dropped after retries.")
+        return False
+
+
+alert_dispatcher = AlertDispatcher()
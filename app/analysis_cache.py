@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+import re
+from typing import List, Optional
+
+from app.cache import PersistentCache
+from app.schemas import InfrastructureRisk, ZoneAnalysisResult
+
+# --- Settings ---
+# How long an LLM verdict for an identical set of sources is trusted.
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", str(24 * 3600)))
+
+analysis_cache = PersistentCache("analysis", default_ttl=ANALYSIS_CACHE_TTL)
+
+
+def normalize_content(text: Optional[str]) -> str:
+    """Collapses whitespace so re-fetches that only differ in layout still hit."""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def source_fingerprint(source: dict) -> str:
+    """Content hash of one source as the analyst sees it (URL, title, date, text)."""
+    payload = "\n".join([
+        normalize_content(source.get("url")),
+        normalize_content(source.get("title")),
+        normalize_content(source.get("published_date")),
+        normalize_content(source.get("content")),
+    ])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def analysis_key(zone: str, sources: List[dict], prompt_version: str, model: str) -> str:
+    """
+    Content-addressed key for one analysis call. Every source contributes its
+    own fingerprint, so changing any single source produces a new key even if
+    the rest of the zone's context is unchanged.
+    """
+    payload = json.dumps({
+        "zone": normalize_content(zone).lower(),
+        "sources": sorted(source_fingerprint(s) for s in sources),
+        "prompt_version": prompt_version,
+        "model": model,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached_analysis(key: str) -> Optional[List[InfrastructureRisk]]:
+    """Returns fresh model instances on a hit (callers mutate them during geocoding)."""
+    cached = analysis_cache.get(key)
+    if cached is None:
+        return None
+    return ZoneAnalysisResult.model_validate(cached).risks
+
+
+def store_analysis(key: str, risks: List[InfrastructureRisk]) -> None:
+    analysis_cache.set(key, ZoneAnalysisResult(risks=risks).model_dump(mode="json"))
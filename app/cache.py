@@ -0,0 +1,70 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Local, per-host cache files. They survive restarts but are safe to delete.
+CACHE_DIR = os.getenv("SENTINEL_CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+
+
+class PersistentCache:
+    """
+    Small on-disk key/value store with per-entry expiry, backed by SQLite.
+    Values must be JSON-serializable. Lookups are local file reads (sub-ms),
+    so they are safe to call directly from async code.
+    """
+
+    def __init__(self, name: str, default_ttl: float):
+        self.name = name
+        self.default_ttl = default_ttl
+        self.path = os.path.join(CACHE_DIR, f"{name}.sqlite3")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Opened lazily so importing a module never touches the disk
+        if self._conn is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("DELETE FROM entries WHERE expires_at < ?", (time.time(),))
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the stored value, or None if missing or expired."""
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < time.time():
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                return None
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+
+    def purge_expired(self) -> int:
+        """TTL eviction: drops every expired entry and returns how many were removed."""
+        with self._lock:
+            cursor = self._connect().execute(
+                "DELETE FROM entries WHERE expires_at < ?", (time.time(),)
+            )
+            return cursor.rowcount
@@ -0,0 +1,144 @@
+import os
+import re
+from typing import List, NamedTuple
+
+# --- Token Budgets ---
+# ZONE_TOKEN_BUDGET caps the whole context for one analysis call.
+# SOURCE_TOKEN_CAP is each source's share when a zone's sources share one call.
+ZONE_TOKEN_BUDGET = int(os.getenv("ZONE_TOKEN_BUDGET", "6000"))
+SOURCE_TOKEN_CAP = int(os.getenv("SOURCE_TOKEN_CAP", "2000"))
+# Chunks are the unit we keep or drop when trimming an article
+CHUNK_TOKENS = 120
+
+# Words that mark a passage as relevant to physical threats on fiber routes
+RELEVANCE_TERMS = (
+    "construct", "excavat", "dig", "dredg", "trench", "road", "expressway", "highway",
+    "drain", "bridge", "flyover", "dualis", "rehabilitat", "expansion", "grading",
+    "bulldozer", "earthwork", "contractor", "demolition", "pipeline", "culvert",
+    "fiber", "fibre", "cable", "telecom", "optic", "cnii", "vandal", "right of way",
+)
+
+_encoder = None
+
+
+def _get_encoder():
+    # Falls back to a 4-chars-per-token estimate if tiktoken is unavailable.
+    # The first call reads (or downloads) the BPE tables, so async code warms it
+    # up with load_encoder in a thread rather than hitting it on the event loop.
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoder = False
+    return _encoder
+
+
+def load_encoder() -> None:
+    """Loads the tokenizer now (blocking; run it in a thread from async code)."""
+    _get_encoder()
+
+
+def count_tokens(text: str) -> int:
+    encoder = _get_encoder()
+    if encoder:
+        return len(encoder.encode(text or "", disallowed_special=()))
+    return (len(text or "") + 3) // 4
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    encoder = _get_encoder()
+    if encoder:
+        return encoder.decode(encoder.encode(text, disallowed_special=())[:max_tokens])
+    return text[: max_tokens * 4]
+
+
+def _chunks(text: str) -> List[str]:
+    """Splits an article into roughly CHUNK_TOKENS-sized passages on sentence boundaries."""
+    chunks, current = [], ""
+    for piece in re.split(r"(?<=[.!?])\s+|\n+", text):
+        piece = piece.strip()
+        if not piece:
+            continue
+        if current and count_tokens(current) + count_tokens(piece) > CHUNK_TOKENS:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}".strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _relevance(chunk: str, zone_terms: List[str]) -> int:
+    lowered = chunk.lower()
+    score = sum(lowered.count(term) for term in RELEVANCE_TERMS)
+    # Mentions of the corridor itself are worth more than generic keywords
+    score += 3 * sum(1 for term in zone_terms if term in lowered)
+    return score
+
+
+def trim_to_budget(text: str, max_tokens: int, zone: str) -> str:
+    """
+    Keeps the passages most relevant to construction/excavation near the zone,
+    in their original order, until max_tokens is reached.
+    """
+    if count_tokens(text) <= max_tokens:
+        return text
+
+    zone_terms = [w for w in re.split(r"[\s\-]+", zone.lower()) if len(w) > 3]
+    chunks = _chunks(text)
+    ranked = sorted(range(len(chunks)), key=lambda i: (-_relevance(chunks[i], zone_terms), i))
+
+    keep, used = [], 0
+    for i in ranked:
+        cost = count_tokens(chunks[i]) + 1
+        if used + cost > max_tokens:
+            continue
+        keep.append(i)
+        used += cost
+
+    if not keep:
+        return _truncate(text, max_tokens)
+    return "\n".join(chunks[i] for i in sorted(keep))
+
+
+def format_sources(sources: List[dict]) -> str:
+    """Builds the labeled context block the analyst reads."""
+    search_context = ""
+    for i, source in enumerate(sources):
+        search_context += (
+            f"--- SOURCE [{i}] ---\n"
+            f"TITLE: {source.get('title')}\n"
+            f"DATE: {source.get('published_date')}\n"
+            f"URL: {source['url']}\n"
+            f"CONTENT: {source['content']}\n\n"
+        )
+    return search_context
+
+
+class ZoneContext(NamedTuple):
+    batches: List[List[dict]]  # Sources grouped per analysis call
+    tokens: int                # Context tokens sent across all calls
+    mode: str                  # "combined" or "per_source"
+
+
+def build_zone_context(zone: str, sources: List[dict]) -> ZoneContext:
+    """
+    Fits a zone's sources into ZONE_TOKEN_BUDGET. Sources are first trimmed to
+    SOURCE_TOKEN_CAP and analyzed together; if that still overflows, each
+    source gets its own call with the full budget and the risks are merged.
+    """
+    trimmed = [dict(s, content=trim_to_budget(s["content"], SOURCE_TOKEN_CAP, zone)) for s in sources]
+    combined_tokens = count_tokens(format_sources(trimmed))
+    if combined_tokens <= ZONE_TOKEN_BUDGET:
+        return ZoneContext([trimmed], combined_tokens, "combined")
+
+    batches, tokens = [], 0
+    for source in sources:
+        header_tokens = count_tokens(format_sources([dict(source, content="")]))
+        single = dict(source, content=trim_to_budget(source["content"], ZONE_TOKEN_BUDGET - header_tokens, zone))
+        batches.append([single])
+        tokens += count_tokens(format_sources([single]))
+    return ZoneContext(batches, tokens, "per_source")
@@ -0,0 +1,233 @@
+import asyncio
+import datetime
+import hashlib
+import os
+import socket
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.database import AsyncSessionLocal, SweepLease
+from app.queries import fetch_latest_report
+from app.schemas import PatrolResponse
+from app.tasks import run_patrol_and_save
+from app.tools import EventCallback, emit
+from app.zones import active_zone_names
+
+# --- Settings ---
+# A sweep that finished less than this many seconds ago is reused instead of re-run
+SWEEP_FRESHNESS_SECONDS = float(os.getenv("SWEEP_FRESHNESS_SECONDS", "120"))
+# The lease expires if its holder dies; the holder renews it every third of this
+SWEEP_LEASE_SECONDS = float(os.getenv("SWEEP_LEASE_SECONDS", "120"))
+# How often a worker waiting on another worker's sweep re-checks the lease
+SWEEP_POLL_SECONDS = float(os.getenv("SWEEP_POLL_SECONDS", "5"))
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+class SweepLeaseLock:
+    """Database-backed lease so only one uvicorn worker/process runs a sweep at a time."""
+
+    def __init__(self, name: str):
+        self.name = name[:64]
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[:128]
+
+    async def acquire(self) -> bool:
+        now = _utcnow()
+        expires = now + datetime.timedelta(seconds=SWEEP_LEASE_SECONDS)
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                # Take over a free/expired lease (or renew our own) atomically
+                result = await session.execute(
+                    update(SweepLease)
+                    .where(SweepLease.name == self.name)
+                    .where(or_(SweepLease.expires_at < now, SweepLease.holder == self.holder))
+                    .values(holder=self.holder, acquired_at=now, expires_at=expires)
+                )
+                if result.rowcount == 1:
+                    return True
+                exists = await session.scalar(select(SweepLease.name).where(SweepLease.name == self.name))
+                if exists:
+                    return False
+        # First sweep ever for this name: the primary key decides who wins
+        try:
+            async with AsyncSessionLocal() as session:
+                async with session.begin():
+                    session.add(SweepLease(name=self.name, holder=self.holder, acquired_at=now, expires_at=expires))
+            return True
+        except IntegrityError:
+            return False
+
+    async def renew(self) -> None:
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                await session.execute(
+                    update(SweepLease)
+                    .where(SweepLease.name == self.name, SweepLease.holder == self.holder)
+                    .values(expires_at=_utcnow() + datetime.timedelta(seconds=SWEEP_LEASE_SECONDS))
+                )
+
+    async def keep_alive(self) -> None:
+        while True:
+            await asyncio.sleep(SWEEP_LEASE_SECONDS / 3)
+            try:
+                await self.renew()
+            except Exception as e:
+                print(f"⚠️ Could not renew sweep lease: {e}")
+
+    async def release(self) -> None:
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                await session.execute(
+                    update(SweepLease)
+                    .where(SweepLease.name == self.name, SweepLease.holder == self.holder)
+                    .values(expires_at=_utcnow())
+                )
+
+    async def is_held_elsewhere(self) -> bool:
+        async with AsyncSessionLocal() as session:
+            lease = await session.get(SweepLease, self.name)
+        return lease is not None and lease.holder != self.holder and lease.expires_at > _utcnow()
+
+
+class _Flight:
+    """One in-flight sweep plus the progress events it has produced so far."""
+
+    def __init__(self):
+        self.events: List[Tuple[str, dict]] = []
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    async def record(self, event: str, data: dict) -> None:
+        self.events.append((event, data))
+        self.changed.set()
+
+    async def follow(self, on_event: EventCallback) -> None:
+        """Replays past events to a late subscriber, then forwards new ones until the sweep ends."""
+        sent = 0
+        while True:
+            while sent < len(self.events):
+                await emit(on_event, *self.events[sent])
+                sent += 1
+            if self.task.done():
+                return
+            self.changed.clear()
+            waiter = asyncio.ensure_future(self.changed.wait())
+            await asyncio.wait({self.task, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+
+
+class SweepCoordinator:
+    """
+    Single-flight entry point for every sweep trigger (scheduler, /patrol,
+    /patrol/trigger-7am, /patrol/stream, the chat agent). Triggers that arrive
+    while a sweep is running attach to it; a sweep that finished within the
+    freshness window is reused; across workers a DB lease keeps one runner.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._recent: Dict[str, Tuple[float, PatrolResponse]] = {}
+
+    @staticmethod
+    def _key(extra_zone: Optional[str], zones: Optional[List[str]] = None) -> str:
+        key = ""
+        if extra_zone and extra_zone.lower() != "string":
+            key = extra_zone.strip().lower()
+        if zones is not None:
+            # Partial sweeps (adaptive schedule) only share with the same zone set
+            digest = hashlib.sha1("\n".join(sorted(zones)).encode("utf-8")).hexdigest()[:16]
+            key = f"{key}|zones:{digest}"
+        return key
+
+    async def run(
+        self,
+        extra_zone: Optional[str] = None,
+        on_event: Optional[EventCallback] = None,
+        max_age: Optional[float] = None,
+        zones: Optional[List[str]] = None,
+    ) -> PatrolResponse:
+        key = self._key(extra_zone, zones)
+        max_age = SWEEP_FRESHNESS_SECONDS if max_age is None else max_age
+
+        fresh = await self._fresh_result(key, max_age, extra_zone, zones)
+        if fresh is not None:
+            print("♻️ Reusing a sweep that just finished.")
+            await emit(on_event, "summary", {"report_id": fresh.report_id, "summary": fresh.summary, "risks": len(fresh.risks), "reused": True})
+            return fresh
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            flight.task = asyncio.create_task(self._execute(key, extra_zone, zones, flight))
+            self._flights[key] = flight
+        else:
+            print("🔗 Sweep already in flight; attaching to it.")
+
+        if on_event is not None:
+            await flight.follow(on_event)
+        # shield: a caller giving up (e.g. HTTP disconnect) never cancels the shared sweep
+        return await asyncio.shield(flight.task)
+
+    @staticmethod
+    async def _scope(extra_zone: Optional[str], zones: Optional[List[str]]) -> List[str]:
+        """Zones a sweep for this request scans (same rule as run_sweep)."""
+        scope = list(zones) if zones is not None else await active_zone_names()
+        if extra_zone and extra_zone.lower() != "string" and extra_zone not in scope:
+            scope.append(extra_zone)
+        return scope
+
+    async def _fresh_result(
+        self, key: str, max_age: float, extra_zone: Optional[str], zones: Optional[List[str]],
+    ) -> Optional[PatrolResponse]:
+        if max_age <= 0:
+            return None
+        recent = self._recent.get(key)
+        if recent and time.monotonic() - recent[0] <= max_age:
+            return recent[1]
+        # Another worker may have run a sweep covering these zones: the latest report tells us
+        return await fetch_latest_report(
+            newer_than=_utcnow() - datetime.timedelta(seconds=max_age),
+            covering=await self._scope(extra_zone, zones),
+        )
+
+    async def _execute(self, key: str, extra_zone: Optional[str], zones: Optional[List[str]], flight: _Flight) -> PatrolResponse:
+        lock = SweepLeaseLock(f"sweep:{key}" if key else "sweep")
+        try:
+            while True:
+                attempt_started = _utcnow()
+                if await lock.acquire():
+                    renewer = asyncio.create_task(lock.keep_alive())
+                    try:
+                        result = await run_patrol_and_save(extra_zone, on_event=flight.record, zones=zones)
+                    finally:
+                        renewer.cancel()
+                        await lock.release()
+                    break
+
+                # Another worker holds the lease: wait for its report instead of duplicating it
+                print("🔗 Sweep running in another worker; waiting for its report.")
+                await flight.record("attached", {"detail": "Sweep already running in another worker"})
+                while await lock.is_held_elsewhere():
+                    await asyncio.sleep(SWEEP_POLL_SECONDS)
+                # Its report only answers this request if it scanned every zone we need
+                result = await fetch_latest_report(
+                    newer_than=attempt_started, covering=await self._scope(extra_zone, zones),
+                )
+                if result is not None:
+                    await flight.record("summary", {"report_id": result.report_id, "summary": result.summary, "risks": len(result.risks)})
+                    break
+                # The other sweep failed (or was for other zones): try to run our own
+
+            self._recent[key] = (time.monotonic(), result)
+            return result
+        finally:
+            self._flights.pop(key, None)
+
+
+sweep_coordinator = SweepCoordinator()
@@ -0,0 +1,127 @@
+import datetime
+import json
+import os
+import zlib
+from typing import AsyncIterator, Iterable, Optional
+
+from sqlalchemy import and_, or_, select
+
+from app.database import RiskRecord, async_engine
+from app.queries import decode_cursor, encode_cursor, risk_filters
+
+# Rows pulled from the server-side cursor per round-trip. Memory use is bounded
+# by this batch size, not by the size of the export.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+EXPORT_COLUMNS = (
+    RiskRecord.id,
+    RiskRecord.report_id,
+    RiskRecord.timestamp,
+    RiskRecord.last_seen,
+    RiskRecord.zone,
+    RiskRecord.location,
+    RiskRecord.risk_level,
+    RiskRecord.risk_score,
+    RiskRecord.threat_type,
+    RiskRecord.summary,
+    RiskRecord.recommended_action,
+    RiskRecord.source_url,
+    RiskRecord.source_title,
+    RiskRecord.published_date,
+    RiskRecord.latitude,
+    RiskRecord.longitude,
+)
+
+
+def _serialize(value):
+    return value.isoformat() if isinstance(value, datetime.datetime) else value
+
+
+def _properties(row) -> dict:
+    return {key: _serialize(value) for key, value in row._mapping.items()}
+
+
+async def stream_risk_batches(
+    after: Optional[str] = None, **filters
+) -> AsyncIterator[list]:
+    """
+    Yields risk rows oldest-first in EXPORT_BATCH_SIZE lists, read through a
+    server-side cursor. `after` is a watermark from a previous export: only rows
+    strictly after that (timestamp, id) are returned.
+    """
+    clauses = risk_filters(**filters)
+    if after:
+        timestamp, risk_id = decode_cursor(after)
+        clauses.append(or_(
+            RiskRecord.timestamp > timestamp,
+            and_(RiskRecord.timestamp == timestamp, RiskRecord.id > risk_id),
+        ))
+    stmt = (
+        select(*EXPORT_COLUMNS)
+        .where(*clauses)
+        .order_by(RiskRecord.timestamp.asc(), RiskRecord.id.asc())
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    async with async_engine.connect() as conn:
+        result = await conn.stream(stmt)
+        async for batch in result.partitions(EXPORT_BATCH_SIZE):
+            yield batch
+
+
+def _watermark(last) -> Optional[str]:
+    return encode_cursor(last.timestamp, last.id) if last is not None and last.timestamp else None
+
+
+async def ndjson_lines(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    """
+    One JSON object per risk, then a final {"watermark": ...} line carrying the
+    cursor to pass as ?after= for the next incremental export (null when
+    nothing matched: keep the previous one).
+    """
+    last = None
+    async for batch in batches:
+        if batch:
+            last = batch[-1]
+        yield "".join(json.dumps(_properties(row)) + "\n" for row in batch).encode("utf-8")
+    yield (json.dumps({"watermark": _watermark(last)}) + "\n").encode("utf-8")
+
+
+async def geojson_chunks(batches: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    """
+    A GeoJSON FeatureCollection written incrementally. A trailing "watermark"
+    member carries the cursor to pass as ?after= for the next incremental export.
+    """
+    yield b'{"type":"FeatureCollection","features":['
+    first, last = True, None
+    async for batch in batches:
+        features = []
+        for row in batch:
+            geometry = None
+            if row.latitude is not None and row.longitude is not None:
+                geometry = {"type": "Point", "coordinates": [row.longitude, row.latitude]}
+            features.append(json.dumps({
+                "type": "Feature",
+                "id": row.id,
+                "geometry": geometry,
+                "properties": _properties(row),
+            }))
+            last = row
+        if features:
+            yield (("" if first else ",") + ",".join(features)).encode("utf-8")
+            first = False
+    yield ("]," + f'"watermark":{json.dumps(_watermark(last))}' + "}").encode("utf-8")
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Compresses on the fly (gzip container) without buffering the whole body."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    encodings: Iterable[str] = (part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(","))
+    return "gzip" in encodings
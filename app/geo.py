@@ -0,0 +1,54 @@
+import math
+from typing import List, Optional, Tuple
+
+# --- Grid Index ---
+# Every risk is stamped with the id of the GEO_CELL_DEG x GEO_CELL_DEG cell it
+# falls in (~5.5 km at the equator). Spatial queries turn their search area
+# into a list of cells and let the (geo_cell, timestamp) index do the pruning.
+# Changing GEO_CELL_DEG requires recomputing geo_cell for every row.
+GEO_CELL_DEG = 0.05
+GRID_COLUMNS = int(round(360 / GEO_CELL_DEG))
+# Above this many cells an IN-list stops paying off; fall back to a range scan
+MAX_QUERY_CELLS = 400
+EARTH_RADIUS_KM = 6371.0088
+
+BBox = Tuple[float, float, float, float]  # (min_lat, min_lng, max_lat, max_lng)
+
+
+def _row(lat: float) -> int:
+    return int(math.floor((lat + 90.0) / GEO_CELL_DEG))
+
+
+def _col(lng: float) -> int:
+    return int(math.floor((lng + 180.0) / GEO_CELL_DEG))
+
+
+def geo_cell(lat: Optional[float], lng: Optional[float]) -> Optional[int]:
+    if lat is None or lng is None:
+        return None
+    return _row(lat) * GRID_COLUMNS + _col(lng)
+
+
+def cells_for_bbox(bbox: BBox) -> Optional[List[int]]:
+    """Every cell the box touches, or None if there are too many to list."""
+    min_lat, min_lng, max_lat, max_lng = bbox
+    rows = range(_row(min_lat), _row(max_lat) + 1)
+    cols = range(_col(min_lng), _col(max_lng) + 1)
+    if len(rows) * len(cols) > MAX_QUERY_CELLS:
+        return None
+    return [r * GRID_COLUMNS + c for r in rows for c in cols]
+
+
+def bbox_for_radius(lat: float, lng: float, radius_km: float) -> BBox:
+    """Smallest lat/lng box that contains the circle."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * max(math.cos(math.radians(lat)), 1e-6)))
+    return (lat - dlat, lng - dlng, lat + dlat, lng + dlng)
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import re
+import time
+from typing import Dict, Optional, Tuple
+
+from app.cache import PersistentCache
+from app.metrics import observe_stage
+from app.zones import zone_coordinates
+
+# Nigeria's geographic centre, used when neither Nominatim nor the zone registry help
+NIGERIA_CENTRE = (9.0820, 8.6753)
+
+# --- Settings ---
+# Nominatim's usage policy allows at most 1 request per second.
+NOMINATIM_MIN_INTERVAL = float(os.getenv("NOMINATIM_MIN_INTERVAL", "1.0"))
+NOMINATIM_TIMEOUT = float(os.getenv("NOMINATIM_TIMEOUT", "5"))
+NOMINATIM_DOMAIN = os.getenv("NOMINATIM_DOMAIN", "nominatim.openstreetmap.org")
+NOMINATIM_SCHEME = os.getenv("NOMINATIM_SCHEME", "https")
+GEOCODE_CACHE_TTL = float(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+# Misses are cached for less time so a newly mapped road gets picked up
+GEOCODE_NEGATIVE_TTL = float(os.getenv("GEOCODE_NEGATIVE_TTL", str(24 * 3600)))
+
+_geolocator = None
+geocode_cache = PersistentCache("geocode", default_ttl=GEOCODE_CACHE_TTL)
+
+Coordinates = Tuple[float, float]
+
+
+def get_geolocator():
+    # Built on first lookup so importing the sweep engine stays cheap
+    global _geolocator
+    if _geolocator is None:
+        from geopy.geocoders import Nominatim
+        _geolocator = Nominatim(user_agent="cnii_sentinel_patrol", domain=NOMINATIM_DOMAIN, scheme=NOMINATIM_SCHEME)
+    return _geolocator
+
+
+def normalize_key(specific_location: str, parent_zone: str) -> str:
+    """Cache key: case/whitespace-insensitive (location, parent_zone) pair."""
+    def clean(value: str) -> str:
+        return re.sub(r"\s+", " ", (value or "").strip().strip(".,;")).lower()
+    return f"{clean(specific_location)}|{clean(parent_zone)}"
+
+
+class NominatimQueue:
+    """
+    Rate-limited queue in front of the blocking geopy client.
+    A single consumer task runs each lookup in a worker thread and waits
+    NOMINATIM_MIN_INTERVAL between calls, so the event loop never blocks.
+    Identical queries that are already queued share one lookup.
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._last_call = 0.0
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # New event loop (e.g. a script calling asyncio.run again): start fresh
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._pending = {}
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+
+    async def lookup(self, query: str) -> Optional[Coordinates]:
+        self._ensure_worker()
+        future = self._pending.get(query)
+        if future is None:
+            future = self._loop.create_future()
+            self._pending[query] = future
+            self._queue.put_nowait((query, future))
+        return await asyncio.shield(future)
+
+    async def _run(self) -> None:
+        while True:
+            query, future = await self._queue.get()
+            wait = self._last_call + self.min_interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                location = await asyncio.to_thread(get_geolocator().geocode, query, timeout=NOMINATIM_TIMEOUT)
+                if not future.done():
+                    future.set_result((location.latitude, location.longitude) if location else None)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._last_call = time.monotonic()
+                self._pending.pop(query, None)
+
+
+nominatim_queue = NominatimQueue(NOMINATIM_MIN_INTERVAL)
+
+
+def zone_fallback(parent_zone: str) -> Coordinates:
+    return zone_coordinates(parent_zone) or NIGERIA_CENTRE
+
+
+async def resolve_coordinates(specific_location: str, parent_zone: str) -> Coordinates:
+    """Helper to geocode locations with cache and fallback."""
+    key = normalize_key(specific_location, parent_zone)
+    cached = geocode_cache.get(key)
+    if cached is not None:
+        if cached.get("found"):
+            return cached["lat"], cached["lng"]
+        return zone_fallback(parent_zone)
+
+    try:
+        with observe_stage("geocode", parent_zone):
+            coords = await nominatim_queue.lookup(f"{specific_location}, Nigeria")
+    except Exception as e:
+        # Network/timeout errors are not cached; the next sweep retries
+        print(f"⚠️ Geocoding Error for '{specific_location}': {e}")
+        return zone_fallback(parent_zone)
+
+    if coords:
+        geocode_cache.set(key, {"found": True, "lat": coords[0], "lng": coords[1]})
+        return coords
+
+    geocode_cache.set(key, {"found": False}, ttl=GEOCODE_NEGATIVE_TTL)
+    return zone_fallback(parent_zone)
@@ -0,0 +1,82 @@
+import asyncio
+import os
+from typing import Dict, Optional
+import httpx
+
+# --- Pool Settings ---
+# One pooled client is shared by every outbound call (Jina, Telegram, ...),
+# so connections and TLS sessions are reused between articles and alerts.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "8"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+class PerHostLimitTransport(httpx.AsyncBaseTransport):
+    """Caps how many requests can be in flight against a single host."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, per_host: int):
+        self._transport = transport
+        self._per_host = max(1, per_host)
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        slot = self._slots.setdefault(request.url.host, asyncio.Semaphore(self._per_host))
+        async with slot:
+            return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _http2_available() -> bool:
+    # HTTP/2 needs the optional 'h2' package (installed via httpx[http2])
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _build_client() -> httpx.AsyncClient:
+    transport = httpx.AsyncHTTPTransport(
+        http2=_http2_available(),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        ),
+        retries=1,
+    )
+    return httpx.AsyncClient(
+        transport=PerHostLimitTransport(transport, HTTP_PER_HOST_LIMIT),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        follow_redirects=True,
+    )
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """Called from the FastAPI lifespan on startup."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+        print("🌐 Shared HTTP client ready.")
+    return _client
+
+
+async def close_http_client() -> None:
+    """Called from the FastAPI lifespan on shutdown."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Returns the shared client, creating it if the lifespan hasn't run (e.g. scripts)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
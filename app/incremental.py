@@ -0,0 +1,143 @@
+import datetime
+import hashlib
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.analysis_cache import normalize_content
+from app.database import AsyncSessionLocal, RiskRecord, SeenSource
+from app.relevance import canonical_url
+from app.schemas import InfrastructureRisk
+
+RiskKey = Tuple[str, str, str]
+
+
+def url_hash(url: str) -> str:
+    return hashlib.sha256(canonical_url(url).encode("utf-8")).hexdigest()
+
+
+def search_fingerprint(result: dict) -> str:
+    """Fingerprint of a Tavily result as seen *before* the Jina fetch."""
+    payload = f"{normalize_content(result.get('title'))}\n{normalize_content(result.get('content'))}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def risk_key(source_url: str, location: str, zone: Optional[str]) -> RiskKey:
+    # Per zone: an article covering two corridors yields (and re-confirms) a risk in each
+    return (source_url or "", (location or "").strip().lower(), zone or "")
+
+
+class SeenSourceIndex:
+    """
+    Per-sweep view of the seen_sources table.
+    load() pulls the rows for this sweep's URLs once; select() then splits each
+    zone's results into new/changed (processed) and unchanged (skipped).
+    """
+
+    def __init__(self):
+        self._seen: Dict[str, Tuple[str, str]] = {}  # url_hash -> (fingerprint, published_date)
+        self._known_risks: Set[RiskKey] = set()
+        self.unchanged_urls: Set[str] = set()
+        self.processed: List[Tuple[str, dict]] = []
+        self.counters = {"new": 0, "changed": 0, "unchanged": 0}
+
+    async def load(self, results: List[dict]) -> None:
+        urls = [r["url"] for r in results]
+        hashes = [url_hash(url) for url in urls]
+        if not hashes:
+            return
+        async with AsyncSessionLocal() as session:
+            rows = await session.execute(
+                select(SeenSource.url_hash, SeenSource.fingerprint, SeenSource.published_date)
+                .where(SeenSource.url_hash.in_(hashes))
+            )
+            self._seen = {h: (fingerprint, published) for h, fingerprint, published in rows}
+            known = await session.execute(
+                select(RiskRecord.source_url, RiskRecord.location, RiskRecord.zone).where(RiskRecord.source_url.in_(urls))
+            )
+            self._known_risks = {risk_key(url, location, zone) for url, location, zone in known}
+
+    def select(self, zone: str, results: List[dict]) -> List[dict]:
+        """Returns only the results that are new or whose content/date changed."""
+        fresh = []
+        for result in results:
+            seen = self._seen.get(url_hash(result["url"]))
+            if seen is None:
+                self.counters["new"] += 1
+            elif seen == (search_fingerprint(result), result.get("published_date")):
+                self.counters["unchanged"] += 1
+                self.unchanged_urls.add(result["url"])
+                continue
+            else:
+                self.counters["changed"] += 1
+            self.processed.append((zone, result))
+            fresh.append(result)
+        return fresh
+
+    def discard(self, zone: str) -> None:
+        """Forgets a zone's sources (e.g. its analysis failed) so the next sweep retries them."""
+        self.processed = [(z, result) for z, result in self.processed if z != zone]
+
+    def is_known(self, risk: InfrastructureRisk) -> bool:
+        return risk_key(risk.source_url, risk.location_identified, risk.zone) in self._known_risks
+
+    async def touch(self, session: AsyncSession, report_id: int, known: List[InfrastructureRisk], now: datetime.datetime) -> List[RiskRecord]:
+        """Re-confirms existing risks (last_seen/last_report_id) in one UPDATE and returns the touched rows."""
+        keys = {risk_key(r.source_url, r.location_identified, r.zone) for r in known}
+        urls = self.unchanged_urls | {url for url, _, _ in keys}
+        if not urls:
+            return []
+        rows = (await session.execute(select(RiskRecord).where(RiskRecord.source_url.in_(urls)))).scalars().all()
+
+        # One row per (source, location, zone): the most recent copy is the canonical one
+        latest: Dict[RiskKey, RiskRecord] = {}
+        for row in rows:
+            key = risk_key(row.source_url, row.location, row.zone)
+            if row.source_url not in self.unchanged_urls and key not in keys:
+                continue
+            if key not in latest or row.id > latest[key].id:
+                latest[key] = row
+        if latest:
+            await session.execute(
+                update(RiskRecord)
+                .where(RiskRecord.id.in_([row.id for row in latest.values()]))
+                .values(last_seen=now, last_report_id=report_id)
+                .execution_options(synchronize_session=False)
+            )
+        return list(latest.values())
+
+    async def record(self, session: AsyncSession, now: datetime.datetime) -> None:
+        """Upserts every processed source into seen_sources with one bulk INSERT and one bulk UPDATE."""
+        latest_by_hash = {url_hash(result["url"]): (zone, result) for zone, result in self.processed}
+        if not latest_by_hash:
+            return
+        existing = set((await session.execute(
+            select(SeenSource.url_hash).where(SeenSource.url_hash.in_(latest_by_hash))
+        )).scalars())
+
+        inserts, updates = [], []
+        for key, (zone, result) in latest_by_hash.items():
+            values = {
+                "fingerprint": search_fingerprint(result),
+                "published_date": result.get("published_date"),
+                "last_seen": now,
+            }
+            if key in existing:
+                updates.append(dict(values, b_url_hash=key))
+            else:
+                inserts.append(dict(values, url_hash=key, url=result["url"][:500], zone=zone, first_seen=now))
+
+        if inserts:
+            await session.execute(insert(SeenSource), inserts)
+        if updates:
+            await session.execute(
+                update(SeenSource.__table__)
+                .where(SeenSource.__table__.c.url_hash == bindparam("b_url_hash"))
+                .values(
+                    fingerprint=bindparam("fingerprint"),
+                    published_date=bindparam("published_date"),
+                    last_seen=bindparam("last_seen"),
+                ),
+                updates,
+            )
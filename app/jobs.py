@@ -0,0 +1,270 @@
+import asyncio
+import datetime
+import json
+import os
+import socket
+from typing import List, Optional
+
+from sqlalchemy import func, select, update
+
+from app.coordinator import sweep_coordinator
+from app.database import IS_MYSQL, AsyncSessionLocal, PatrolRun
+from app.queries import fetch_report
+from app.schemas import PatrolResponse
+from app.tools import EventCallback, emit
+
+# --- Settings ---
+# "inline": the web process runs sweeps itself (single-container deployments).
+# "worker": the web tier only enqueues; `python -m app.worker` runs the sweeps.
+SWEEP_EXECUTION = os.getenv("SWEEP_EXECUTION", "inline").lower()
+# How often a caller waiting on a queued run re-reads its status
+RUN_POLL_SECONDS = float(os.getenv("RUN_POLL_SECONDS", "2"))
+# A running run whose heartbeat is older than this is assumed to have lost its worker
+RUN_STALE_SECONDS = float(os.getenv("RUN_STALE_SECONDS", "300"))
+# Runs requeued this many times are marked failed instead of retried again
+RUN_MAX_ATTEMPTS = int(os.getenv("RUN_MAX_ATTEMPTS", "3"))
+# Synchronous callers (POST /patrol, the agent) give up waiting after this long
+RUN_WAIT_TIMEOUT = float(os.getenv("RUN_WAIT_TIMEOUT", "900"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"[:128]
+FINISHED = ("succeeded", "failed")
+
+# Keeps inline runs started by submit_run referenced until they finish
+_inline_runs = set()
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def _clean_zone(extra_zone: Optional[str]) -> Optional[str]:
+    if not extra_zone or extra_zone.strip().lower() == "string":
+        return None
+    return extra_zone.strip()[:255]
+
+
+def _zones_json(zones: Optional[List[str]]) -> Optional[str]:
+    return json.dumps(sorted(zones)) if zones is not None else None
+
+
+def worker_mode() -> bool:
+    return SWEEP_EXECUTION == "worker"
+
+
+async def get_run(run_id: int) -> Optional[PatrolRun]:
+    async with AsyncSessionLocal() as session:
+        return await session.get(PatrolRun, run_id)
+
+
+async def count_active_runs() -> int:
+    """Runs that are queued or in progress."""
+    async with AsyncSessionLocal() as session:
+        return await session.scalar(
+            select(func.count(PatrolRun.id)).where(PatrolRun.status.in_(("queued", "running")))
+        )
+
+
+async def enqueue_run(trigger: str, extra_zone: Optional[str] = None, zones: Optional[List[str]] = None) -> PatrolRun:
+    """
+    Adds a queued run for the workers. A run for the same zones that is still
+    waiting in the queue already covers this trigger, so it is returned instead.
+    """
+    zone = _clean_zone(extra_zone)
+    zone_list = _zones_json(zones)
+    same_zone = PatrolRun.extra_zone.is_(None) if zone is None else PatrolRun.extra_zone == zone
+    same_list = PatrolRun.zones.is_(None) if zone_list is None else PatrolRun.zones == zone_list
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            waiting = await session.scalar(
+                select(PatrolRun)
+                .where(PatrolRun.status == "queued", same_zone, same_list)
+                .order_by(PatrolRun.id)
+                .limit(1)
+            )
+            if waiting is not None:
+                return waiting
+            run = PatrolRun(
+                status="queued", trigger=trigger, extra_zone=zone, zones=zone_list, created_at=_utcnow(), attempts=0,
+            )
+            session.add(run)
+        print(f"📥 Queued patrol run {run.id} (trigger: {trigger}, extra zone: {zone}, zones: {zone_list or 'all'})")
+        return run
+
+
+async def start_run(trigger: str, extra_zone: Optional[str] = None, zones: Optional[List[str]] = None) -> PatrolRun:
+    """Records a run this process executes right away (inline mode)."""
+    now = _utcnow()
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            run = PatrolRun(
+                status="running", trigger=trigger, extra_zone=_clean_zone(extra_zone), zones=_zones_json(zones),
+                created_at=now, started_at=now, heartbeat_at=now, worker=WORKER_ID, attempts=1,
+            )
+            session.add(run)
+        return run
+
+
+async def claim_next_run(worker: str = WORKER_ID) -> Optional[PatrolRun]:
+    """
+    Moves the oldest queued run to "running" for this worker. On MySQL the
+    candidate row is read with FOR UPDATE SKIP LOCKED so concurrent workers
+    never block on each other; the conditional UPDATE makes the claim safe on
+    databases without row locks too.
+    """
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            stmt = select(PatrolRun.id).where(PatrolRun.status == "queued").order_by(PatrolRun.id).limit(1)
+            if IS_MYSQL:
+                stmt = stmt.with_for_update(skip_locked=True)
+            run_id = await session.scalar(stmt)
+            if run_id is None:
+                return None
+            now = _utcnow()
+            claimed = await session.execute(
+                update(PatrolRun)
+                .where(PatrolRun.id == run_id, PatrolRun.status == "queued")
+                .values(
+                    status="running", started_at=now, heartbeat_at=now, worker=worker,
+                    attempts=PatrolRun.attempts + 1,
+                )
+            )
+            if claimed.rowcount != 1:
+                return None
+        return await session.get(PatrolRun, run_id, populate_existing=True)
+
+
+async def heartbeat(run_id: int) -> None:
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(
+                update(PatrolRun)
+                .where(PatrolRun.id == run_id, PatrolRun.status == "running")
+                .values(heartbeat_at=_utcnow())
+            )
+
+
+async def _keep_alive(run_id: int) -> None:
+    while True:
+        await asyncio.sleep(RUN_STALE_SECONDS / 5)
+        try:
+            await heartbeat(run_id)
+        except Exception as e:
+            print(f"⚠️ Could not update heartbeat for run {run_id}: {e}")
+
+
+async def finish_run(run_id: int, report_id: Optional[int] = None, error: Optional[str] = None) -> None:
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(
+                update(PatrolRun)
+                .where(PatrolRun.id == run_id)
+                .values(
+                    status="failed" if error else "succeeded",
+                    finished_at=_utcnow(),
+                    report_id=report_id,
+                    error=error[:2000] if error else None,
+                )
+            )
+
+
+async def requeue_stale_runs() -> int:
+    """Puts runs whose worker died back in the queue (or fails them after RUN_MAX_ATTEMPTS)."""
+    cutoff = _utcnow() - datetime.timedelta(seconds=RUN_STALE_SECONDS)
+    stale = (PatrolRun.status == "running", PatrolRun.heartbeat_at < cutoff)
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            requeued = await session.execute(
+                update(PatrolRun)
+                .where(*stale, PatrolRun.attempts < RUN_MAX_ATTEMPTS)
+                .values(status="queued", worker=None)
+            )
+            await session.execute(
+                update(PatrolRun)
+                .where(*stale)
+                .values(status="failed", finished_at=_utcnow(), error="Worker stopped responding")
+            )
+    if requeued.rowcount:
+        print(f"♻️ Requeued {requeued.rowcount} patrol run(s) abandoned by their worker.")
+    return requeued.rowcount
+
+
+async def execute_run(run: PatrolRun, on_event: Optional[EventCallback] = None) -> PatrolResponse:
+    """Runs a claimed run through the sweep coordinator and records the outcome."""
+    renewer = asyncio.create_task(_keep_alive(run.id))
+    try:
+        zones = json.loads(run.zones) if run.zones else None
+        result = await sweep_coordinator.run(run.extra_zone, on_event=on_event, zones=zones)
+    except Exception as e:
+        await finish_run(run.id, error=str(e) or type(e).__name__)
+        print(f"❌ Patrol run {run.id} failed: {e}")
+        raise
+    finally:
+        renewer.cancel()
+    await finish_run(run.id, report_id=result.report_id)
+    print(f"✅ Patrol run {run.id} finished (report {result.report_id}).")
+    return result
+
+
+async def wait_for_run(run_id: int, on_event: Optional[EventCallback] = None) -> PatrolRun:
+    """Polls a queued run until a worker finishes it, emitting each status change."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + RUN_WAIT_TIMEOUT
+    last_status = None
+    while True:
+        run = await get_run(run_id)
+        if run is None:
+            raise RuntimeError(f"Patrol run {run_id} disappeared from the queue")
+        if run.status != last_status:
+            last_status = run.status
+            if run.status not in FINISHED:
+                await emit(on_event, run.status, {"run_id": run.id})
+        if run.status in FINISHED:
+            return run
+        if loop.time() > deadline:
+            raise TimeoutError(f"Patrol run {run_id} is still {run.status}; poll GET /patrol/runs/{run_id}")
+        await asyncio.sleep(RUN_POLL_SECONDS)
+
+
+async def request_sweep(
+    trigger: str,
+    extra_zone: Optional[str] = None,
+    on_event: Optional[EventCallback] = None,
+    zones: Optional[List[str]] = None,
+) -> PatrolResponse:
+    """
+    Entry point for callers that need the sweep's result (POST /patrol,
+    /patrol/stream, the chat agent). Inline mode runs it here; worker mode
+    queues it and waits for a worker. Across processes only run status changes
+    are streamed, not the per-zone progress events.
+    """
+    if not worker_mode():
+        return await execute_run(await start_run(trigger, extra_zone, zones), on_event=on_event)
+
+    queued = await enqueue_run(trigger, extra_zone, zones)
+    run = await wait_for_run(queued.id, on_event=on_event)
+    if run.status == "failed":
+        raise RuntimeError(run.error or f"Patrol run {run.id} failed")
+    report = await fetch_report(run.report_id) if run.report_id else None
+    if report is None:
+        raise RuntimeError(f"Patrol run {run.id} finished without a report")
+    await emit(on_event, "summary", {"report_id": report.report_id, "summary": report.summary, "risks": len(report.risks)})
+    return report
+
+
+async def submit_run(trigger: str, extra_zone: Optional[str] = None) -> PatrolRun:
+    """Fire-and-forget: queues the run (worker mode) or starts it in the background (inline)."""
+    if worker_mode():
+        return await enqueue_run(trigger, extra_zone)
+
+    run = await start_run(trigger, extra_zone)
+
+    async def execute():
+        try:
+            await execute_run(run)
+        except Exception:
+            pass  # already recorded on the run row
+
+    task = asyncio.create_task(execute())
+    _inline_runs.add(task)
+    task.add_done_callback(_inline_runs.discard)
+    return run
@@ -1,56 +1,130 @@
 import os
 import json
+import time
+import asyncio
+import datetime
 import traceback
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from fastapi import BackgroundTasks, FastAPI, HTTPException, Depends
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
 from sse_starlette.sse import EventSourceResponse
-from langchain_core.messages import HumanMessage
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from pytz import timezone
 import httpx
 
 # --- MODULAR IMPORTS ---
-from app.database import SessionLocal, init_db, PatrolReport
-from app.schemas import PatrolResponse, PatrolRequest, InfrastructureRisk, ChatRequest
-from app.agent import agent 
-# NEW: Import the task logic
-from app.tasks import run_patrol_and_save
-from app.tools import perform_patrol_sweep
+from app.database import init_db
+from app.schemas import (
+    PatrolResponse, PatrolRequest, PatrolRunStatus, ChatRequest, RiskPage, SpatialResult, TrendReport, ZoneRequest, ZoneStatus,
+)
+from app.export import accepts_gzip, geojson_chunks, gzip_stream, ndjson_lines, stream_risk_batches
+from app.queries import (
+    MAX_PAGE_SIZE, MAX_SPATIAL_RESULTS, MAX_TREND_DAYS, TREND_DIMENSIONS,
+    decode_cursor, fetch_risk_page, fetch_risk_trends, fetch_sweep_trace, fetch_risks_in_bbox, fetch_risks_nearby,
+)
+from app.report_cache import cached_latest_report, etag_matches
+from app.agent import get_agent
+# NEW: Import the task logic (every sweep trigger becomes a patrol run)
+from app.jobs import get_run, request_sweep, submit_run, worker_mode
+from app.scheduling import add_maintenance_schedule, add_sweep_schedule
+from app.retention import scheduled_retention
+from app.zones import load_zones, plan_due_zones, upsert_zone
+from app.http_client import start_http_client, close_http_client
+from app.alerts import alert_dispatcher
+from app.tools import get_openai_client, get_tavily_client
+from app.context import load_encoder
+from app.metrics import CHAT_FIRST_TOKEN_SECONDS, METRICS_CONTENT_TYPE, RequestMetricsMiddleware, render_metrics
 
 load_dotenv()
 
+# --- STARTUP MODE ---
+# "background": accept requests right away; the schema check and the heavy
+#   clients (agent, Tavily, OpenAI) warm up in a task. /ready reports progress.
+# "eager": finish all of it before serving (the previous behaviour).
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background").lower()
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "5"))
+
+warmup_status = {"database": False, "clients": False, "error": None}
+
+def build_clients():
+    load_encoder()
+    get_agent()
+    get_tavily_client()
+    get_openai_client()
+
+async def warm_up():
+    started = time.perf_counter()
+    # create_all makes blocking round-trips to the (possibly remote) database
+    while not warmup_status["database"]:
+        try:
+            await asyncio.to_thread(init_db)
+            warmup_status["database"] = True
+            warmup_status["error"] = None
+        except Exception as e:
+            warmup_status["error"] = f"database: {e}"
+            print(f"⚠️ Schema check failed ({e}); retrying in {WARMUP_RETRY_SECONDS:.0f} s")
+            await asyncio.sleep(WARMUP_RETRY_SECONDS)
+    print(f"🗄️ Schema check done in {time.perf_counter() - started:.2f} s")
+
+    # Importing LangChain/OpenAI/Tavily is CPU-bound; a thread keeps the loop serving
+    try:
+        await asyncio.to_thread(build_clients)
+        warmup_status["clients"] = True
+        print(f"🔥 Warm-up complete in {time.perf_counter() - started:.2f} s")
+    except Exception as e:
+        # Not fatal: each client is built again on first use
+        warmup_status["error"] = f"clients: {e}"
+        print(f"⚠️ Warm-up could not build clients: {e}")
+
+_warmup_tasks = set()
+
 # --- SCHEDULER SETUP ---
 # scheduler = BackgroundScheduler()
+# Only used in inline mode: with SWEEP_EXECUTION=worker the schedule runs in app.worker,
+# so adding uvicorn workers no longer multiplies the scheduled sweeps.
 scheduler = AsyncIOScheduler()
+
+async def scheduled_sweep():
+    await request_sweep("scheduler")
+
+async def scheduled_zone_sweep():
+    # Adaptive schedule: only the zones that are due, hottest first
+    due = await plan_due_zones()
+    if due:
+        await request_sweep("scheduler", zones=due)
+
 def configure_scheduler():
-    env_mode = os.getenv("ENVIRONMENT", "TESTING").upper()
-    
-    # Define Nigeria Time
-    lagos_time = timezone('Africa/Lagos')
-    
-    if env_mode == "PRODUCTION":
-        # Pass the timezone to the cron trigger
-        scheduler.add_job(run_patrol_and_save, 'cron', hour=7, minute=0, timezone=lagos_time)
-        print("🕒 Scheduler: PRODUCTION Mode (Daily at 7:00 AM Lagos Time)")
-    else:
-        scheduler.add_job(run_patrol_and_save, 'interval', minutes=10)
-        print("🕒 Scheduler: TESTING Mode (Every 10 minutes)")
+    add_sweep_schedule(scheduler, scheduled_sweep, scheduled_zone_sweep)
+    add_maintenance_schedule(scheduler, scheduled_retention)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # --- STARTUP ---
-    print("🚀 Sentinel System Starting...")
-    init_db()
-    configure_scheduler()
-    scheduler.start()
+    print(f"🚀 Sentinel System Starting... (startup mode: {STARTUP_MODE})")
+    await start_http_client()
+    if STARTUP_MODE == "eager":
+        await warm_up()
+    else:
+        task = asyncio.create_task(warm_up())
+        _warmup_tasks.add(task)
+        task.add_done_callback(_warmup_tasks.discard)
+    if not worker_mode():
+        configure_scheduler()
+        scheduler.start()
+    else:
+        print("📥 Sweep execution: worker mode (this process only enqueues runs)")
     yield
     # --- SHUTDOWN ---
     print("🛑 Sentinel System Shutting Down...")
-    scheduler.shutdown()
+    for task in list(_warmup_tasks):
+        task.cancel()
+    if scheduler.running:
+        scheduler.shutdown()
+    await alert_dispatcher.stop()  # flush queued alerts first
+    await close_http_client()
 
 app = FastAPI(title="CNII Sentinel API", version="2.1", lifespan=lifespan)
 
@@ -62,35 +136,49 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
+# Request latency histograms (sentinel_request_seconds) for the hot endpoints
+app.add_middleware(RequestMetricsMiddleware, paths=("/patrol/latest", "/chat"))
 
 @app.get("/health")
 async def health_check():
     return {"status": "online", "message": "Sentinel Brain is active"}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (per-stage latency/errors, tokens, sweeps, request latency)."""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness (unlike /health, which is liveness): 503 until the schema check
+    has completed. Clients still warming up are reported but don't block it.
+    """
+    body = {"ready": warmup_status["database"], **warmup_status}
+    return Response(
+        content=json.dumps(body),
+        media_type="application/json",
+        status_code=200 if warmup_status["database"] else 503,
+    )
 # --- 1. DASHBOARD ENDPOINT (Refactored) ---
 
 @app.get("/patrol/trigger-7am")
 @app.get("/patrol/trigger-7am")
-async def trigger_morning_patrol(background_tasks: BackgroundTasks):
+async def trigger_morning_patrol():
     """
     Tactical Trigger: This endpoint is called by an external cron job 
     to ensure the patrol runs even if the server just woke up.
     """
-    # background_tasks.add_task ensures the API responds immediately 
-    # while the AI works in the background
-    background_tasks.add_task(run_patrol_and_save)
+    # submit_run returns immediately while the AI works in the background:
+    # queued for a sweep worker (or started in-process in inline mode); the
+    # coordinator folds it into any sweep already running (or just finished)
+    run = await submit_run("cron-endpoint")
     
     return {
         "status": "Tactical Sweep Initiated",
         "timestamp": "07:00 WAT",
-        "mode": "Background Execution"
+        "mode": "Background Execution",
+        "run_id": run.id,
     }
 
 @app.post("/patrol", response_model=PatrolResponse)
@@ -98,64 +186,235 @@ async def start_patrol_endpoint(request: PatrolRequest):
     try:
         # REFACTOR: Just call the shared task function!
         # This keeps your code DRY (Don't Repeat Yourself)
-        return await run_patrol_and_save(request.extra_zone)
+        # Goes through the coordinator so concurrent triggers share one sweep
+        return await request_sweep("api", request.extra_zone)
     except Exception as e:
         print(f"CRASH: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# --- 1b. PATROL RUNS (job queue) ---
+@app.post("/patrol/runs", response_model=PatrolRunStatus, status_code=202)
+async def enqueue_patrol_run(request: PatrolRequest):
+    """Queues a sweep and returns immediately; poll GET /patrol/runs/{id} for the outcome."""
+    run = await submit_run("api", request.extra_zone)
+    return PatrolRunStatus.from_record(run)
+
+@app.get("/patrol/runs/{run_id}", response_model=PatrolRunStatus)
+async def get_patrol_run(run_id: int):
+    run = await get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found.")
+    return PatrolRunStatus.from_record(run)
+
+# --- 1c. ZONE REGISTRY ---
+@app.get("/zones", response_model=List[ZoneStatus])
+async def list_zones(include_inactive: bool = False):
+    """Monitored zones with their heat, scan interval and next scheduled scan."""
+    zones = await load_zones(active_only=not include_inactive)
+    return [ZoneStatus.from_record(z) for z in zones]
+
+@app.post("/zones", response_model=ZoneStatus)
+async def save_zone(request: ZoneRequest):
+    """Adds a zone (scanned on its first scheduler tick) or updates one; active=false stops scanning it."""
+    zone = await upsert_zone(request.name.strip(), request.latitude, request.longitude, request.active)
+    return ZoneStatus.from_record(zone)
+
+# Keeps streamed sweeps alive (and referenced) after their client disconnects
+_background_sweeps = set()
+
+@app.get("/patrol/stream")
+async def stream_patrol(extra_zone: Optional[str] = None):
+    """
+    Live patrol over Server-Sent Events: zone_started, sources_found, each risk
+    as soon as it is analyzed and geocoded, zone_complete, then a final summary
+    once the report is saved (or an error event). In worker mode the sweep runs
+    in another process, so only queued/running and the final summary are sent.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def on_event(event: str, data: dict):
+        await queue.put((event, data))
+
+    async def run():
+        try:
+            await request_sweep("stream", extra_zone, on_event=on_event)
+        except Exception as e:
+            await queue.put(("error", {"detail": str(e)}))
+        finally:
+            await queue.put(None)
+
+    # The sweep is not cancelled if the operator closes the tab: it still saves its report
+    task = asyncio.create_task(run())
+    _background_sweeps.add(task)
+    task.add_done_callback(_background_sweeps.discard)
+
+    async def generate():
+        while (item := await queue.get()) is not None:
+            event, data = item
+            yield {"event": event, "data": json.dumps(data)}
+
+    return EventSourceResponse(generate())
+
 # --- 2. GET HISTORY ENDPOINT ---
 @app.get("/patrol/latest", response_model=PatrolResponse)
-def get_latest_report(db: Session = Depends(get_db)):
-    latest_report = db.query(PatrolReport).order_by(PatrolReport.timestamp.desc()).first()
-    if not latest_report:
+async def get_latest_report(request: Request):
+    """
+    Polled by the Flutter dashboard. Served from an in-process cache that is
+    invalidated when a new report commits; unchanged polls get a 304.
+    """
+    cached = await cached_latest_report()
+    if cached is None:
         raise HTTPException(status_code=404, detail="No data.")
 
-    # 1. Define Priority Map
-    priority_map = {
-        "High": 3, 
-        "Medium": 2, 
-        "Low": 1
-    }
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/patrol/reports/{report_id}/trace")
+async def get_sweep_trace(report_id: int):
+    """Per-stage spans of the sweep that produced a report (recorded when SWEEP_TRACES=true)."""
+    spans = await fetch_sweep_trace(report_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail="No trace recorded for this report.")
+    return {"report_id": report_id, "spans": spans}
 
-    # 2. Sort risks (High -> Low)
-    # We use .get(..., 0) to handle unexpected values safely
-    sorted_db_risks = sorted(
-        latest_report.risks, 
-        key=lambda r: priority_map.get(r.risk_level, 0), 
-        reverse=True
+# --- 2b. RISK HISTORY (keyset pagination) ---
+@app.get("/risks", response_model=RiskPage)
+async def list_risks(
+    zone: Optional[str] = None,
+    threat_type: Optional[str] = None,
+    min_score: Optional[int] = Query(None, ge=0, le=10),
+    max_score: Optional[int] = Query(None, ge=0, le=10),
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+):
+    """Browse stored risks newest-first. Follow next_cursor for older pages."""
+    try:
+        return await fetch_risk_page(
+            limit, cursor,
+            zone=zone, threat_type=threat_type,
+            min_score=min_score, max_score=max_score,
+            since=since, until=until,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# --- 2c. SPATIAL QUERIES ---
+@app.get("/risks/nearby", response_model=SpatialResult)
+async def risks_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(5, gt=0, le=200),
+    days: int = Query(30, ge=1, le=3650),
+    threat_type: Optional[str] = None,
+    min_score: Optional[int] = Query(None, ge=0, le=10),
+    limit: int = Query(200, ge=1, le=MAX_SPATIAL_RESULTS),
+):
+    """e.g. all risks within 5 km of a fiber corridor point over the last 30 days."""
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    return await fetch_risks_nearby(
+        lat, lng, radius_km, limit,
+        since=since, threat_type=threat_type, min_score=min_score,
     )
 
-    # 3. Format for Response
-    formatted_risks = [
-    InfrastructureRisk(
-        risk_level=r.risk_level,
-        risk_score=r.risk_score if r.risk_score is not None else 0, # Fallback to 0
-        summary=r.summary if r.summary is not None else "No summary available", # Fallback string
-        location_identified=r.location,
-        threat_type=r.threat_type,
-        recommended_action=r.recommended_action,
-        latitude=r.latitude,
-        longitude=r.longitude,
-        source_url=r.source_url,
-        source_title=r.source_title,   # 🆕 Pass to Flutter
-        published_date=r.published_date # 🆕 Pass to Flutter
-    ) for r in sorted_db_risks
-]
-    
-    return PatrolResponse(summary=latest_report.summary, risks=formatted_risks)
+@app.get("/risks/bbox", response_model=SpatialResult)
+async def risks_in_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lng: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lng: float = Query(..., ge=-180, le=180),
+    days: int = Query(30, ge=1, le=3650),
+    threat_type: Optional[str] = None,
+    min_score: Optional[int] = Query(None, ge=0, le=10),
+    limit: int = Query(200, ge=1, le=MAX_SPATIAL_RESULTS),
+):
+    """Risks inside the map viewport, newest first."""
+    if min_lat > max_lat or min_lng > max_lng:
+        raise HTTPException(status_code=400, detail="min_lat/min_lng must not exceed max_lat/max_lng.")
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=days)
+    return await fetch_risks_in_bbox(
+        (min_lat, min_lng, max_lat, max_lng), limit,
+        since=since, threat_type=threat_type, min_score=min_score,
+    )
+
+# --- 2d. BULK EXPORT (GIS / warehouse) ---
+EXPORT_FORMATS = {
+    "geojson": ("application/geo+json", geojson_chunks),
+    "ndjson": ("application/x-ndjson", ndjson_lines),
+}
+
+@app.get("/export/risks.{fmt}")
+async def export_risks(
+    fmt: str,
+    request: Request,
+    since: Optional[datetime.datetime] = None,
+    after: Optional[str] = Query(None, description="Watermark from a previous export"),
+    zone: Optional[str] = None,
+    threat_type: Optional[str] = None,
+    min_score: Optional[int] = Query(None, ge=0, le=10),
+):
+    """
+    Streams every matching risk (oldest first) as GeoJSON or NDJSON, gzip-compressed
+    when the client accepts it. Rows are read in fixed-size batches from a
+    server-side cursor, so memory stays flat regardless of export size.
+    Both formats end with a "watermark" (the GeoJSON member / the last NDJSON
+    line): pass it as ?after= to fetch only newer rows next time.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise HTTPException(status_code=404, detail="Format must be 'geojson' or 'ndjson'.")
+    if after:
+        try:
+            decode_cursor(after)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    media_type, encoder = EXPORT_FORMATS[fmt]
+    body = encoder(stream_risk_batches(
+        after, since=since, zone=zone, threat_type=threat_type, min_score=min_score,
+    ))
+    headers = {"Content-Disposition": f'attachment; filename="risk_records.{fmt}"'}
+    if accepts_gzip(request.headers.get("accept-encoding")):
+        body = gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+# --- 2e. TREND ANALYTICS (daily rollups) ---
+@app.get("/analytics/trends", response_model=TrendReport)
+async def risk_trends(
+    days: int = Query(30, ge=1, le=MAX_TREND_DAYS),
+    group_by: Optional[str] = Query(None, description="zone, threat_type or risk_level"),
+    zone: Optional[str] = None,
+    threat_type: Optional[str] = None,
+):
+    """New risks per day (UTC) with average/max score and week-over-week change, for dashboard charts."""
+    if group_by and group_by not in TREND_DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(TREND_DIMENSIONS)}")
+    return await fetch_risk_trends(days, group_by=group_by, zone=zone, threat_type=threat_type)
 
 # --- 3. CHAT ENDPOINT ---
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
     message = request.message 
+    received = time.perf_counter()
+    from langchain_core.messages import HumanMessage
+    # Built in a thread if the warm-up task hasn't got to it yet
+    agent = await asyncio.to_thread(get_agent)
     
     async def generate():
+        first_token = True
         try:
             async for chunk in agent.astream({"messages": [HumanMessage(content=message)]}, stream_mode="messages"):
                 if isinstance(chunk, tuple) and len(chunk) >= 1:
                     msg = chunk[0]
                     if hasattr(msg, "content") and msg.content:
                         if not (hasattr(msg, "tool_calls") and msg.tool_calls):
+                            if first_token:
+                                CHAT_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - received)
+                                first_token = False
                             yield json.dumps({"token": msg.content}) + "\n"
         except Exception as e:
             print(f"Streaming Error: {e}")
@@ -0,0 +1,163 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+
+from app.zones import is_known_zone
+
+# --- Settings ---
+# Save each sweep's spans (stage, zone, offset, duration) next to its PatrolReport
+SWEEP_TRACES = os.getenv("SWEEP_TRACES", "false").lower() == "true"
+# With several uvicorn workers, point this at a shared empty directory so
+# /metrics aggregates every process (prometheus_client multiprocess mode)
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SWEEP_BUCKETS = (5, 15, 30, 60, 120, 300, 600, 1200, 1800)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Stages: search (Tavily), fetch (Jina), analyze (OpenAI), geocode (Nominatim),
+# telegram, db_commit. Zone is "-" for stages that are not per zone.
+STAGE_SECONDS = Histogram(
+    "sentinel_stage_seconds", "Latency of one call in a sweep stage", ["stage", "zone"], buckets=STAGE_BUCKETS,
+)
+STAGE_ERRORS = Counter("sentinel_stage_errors_total", "Failed calls in a sweep stage", ["stage", "zone"])
+LLM_TOKENS = Counter("sentinel_llm_tokens_total", "OpenAI tokens used by the analyst", ["zone", "kind"])
+
+SWEEP_SECONDS = Histogram("sentinel_sweep_seconds", "Wall time of a full sweep", ["outcome"], buckets=SWEEP_BUCKETS)
+SWEEPS = Counter("sentinel_sweeps_total", "Completed sweeps", ["outcome"])
+SWEEP_RISKS = Counter("sentinel_sweep_risks_total", "Risks reported by sweeps", ["zone", "kind"])
+
+REQUEST_SECONDS = Histogram(
+    "sentinel_request_seconds", "API request latency (until the last body chunk)", ["path", "status"],
+    buckets=REQUEST_BUCKETS,
+)
+CHAT_FIRST_TOKEN_SECONDS = Histogram(
+    "sentinel_chat_first_token_seconds", "Time from /chat request to the first streamed token", buckets=REQUEST_BUCKETS,
+)
+
+
+def zone_label(zone: Optional[str]) -> str:
+    # Extra zones are free text: folding them keeps label cardinality bounded
+    if not zone:
+        return "-"
+    return zone if is_known_zone(zone) else "extra"
+
+
+# --- Per-sweep trace ---
+class TraceRecorder:
+    """Spans recorded by observe_stage while a sweep runs (shared by its tasks)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[dict] = []
+
+    def add(self, stage: str, zone: Optional[str], start: float, elapsed: float, failed: bool) -> None:
+        self.spans.append({
+            "stage": stage,
+            "zone": zone,
+            "offset_ms": round((start - self.started) * 1000, 1),
+            "duration_ms": round(elapsed * 1000, 1),
+            "error": failed,
+        })
+
+    def to_json(self) -> str:
+        return json.dumps(sorted(self.spans, key=lambda s: s["offset_ms"]))
+
+
+_current_trace: ContextVar[Optional[TraceRecorder]] = ContextVar("sentinel_sweep_trace", default=None)
+
+
+@contextmanager
+def trace_sweep() -> Iterator[Optional[TraceRecorder]]:
+    """Collects spans for the sweep running in this context (None unless SWEEP_TRACES)."""
+    if not SWEEP_TRACES:
+        yield None
+        return
+    trace = TraceRecorder()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+class _StageOutcome:
+    __slots__ = ("failed",)
+
+    def __init__(self):
+        self.failed = False
+
+    def fail(self) -> None:
+        """Marks the call failed without raising (e.g. a non-200 response)."""
+        self.failed = True
+
+
+@contextmanager
+def observe_stage(stage: str, zone: Optional[str] = None) -> Iterator[_StageOutcome]:
+    """Times one stage call; exceptions (and fail()) count as errors."""
+    outcome = _StageOutcome()
+    start = time.perf_counter()
+    try:
+        yield outcome
+    except Exception:
+        outcome.failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        labels = (stage, zone_label(zone))
+        STAGE_SECONDS.labels(*labels).observe(elapsed)
+        if outcome.failed:
+            STAGE_ERRORS.labels(*labels).inc()
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, zone, start, elapsed, outcome.failed)
+
+
+def record_tokens(zone: Optional[str], usage) -> None:
+    if usage is None:
+        return
+    LLM_TOKENS.labels(zone_label(zone), "prompt").inc(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(zone_label(zone), "completion").inc(usage.completion_tokens or 0)
+
+
+def render_metrics() -> bytes:
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing selected paths until the response body is complete (works for streams)."""
+
+    def __init__(self, app, paths):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_SECONDS.labels(scope["path"], str(status["code"])).observe(time.perf_counter() - start)
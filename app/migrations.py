@@ -0,0 +1,330 @@
+"""
+Versioned schema migrations (replaces the update_db_v*.py / fix_db.py scripts).
+
+    python -m app.migrations            # apply pending versions
+    python -m app.migrations --status   # list applied / pending versions
+
+Applied versions are recorded in schema_migrations. Every step checks the live
+schema first, so a version re-applies cleanly on a database that the old
+scripts already upgraded by hand. On MySQL columns and indexes are added with
+ALGORITHM=INPLACE, LOCK=NONE (reads and writes continue during the build),
+backfills run in primary-key ranges of MIGRATION_BATCH_SIZE rows with a commit
+after each, and a GET_LOCK keeps concurrent starters from migrating twice.
+
+New tables need no version: create_all builds them (with their indexes) before
+the migrations run. Add a version only to change a table that already exists.
+"""
+import argparse
+import datetime
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, List, NamedTuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock for SQLite
+    fcntl = None
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Connection
+
+from app.database import IS_MYSQL, Base, SchemaMigration, engine
+from app.geo import GEO_CELL_DEG, GRID_COLUMNS
+
+# --- Settings ---
+# Apply pending migrations from init_db (API warm-up and worker start). With
+# "false" they only run through `python -m app.migrations`.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() == "true"
+# Rows per backfill UPDATE; each batch commits, so no statement holds locks for long
+MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", "5000"))
+# Seconds a second process waits for the migration lock before giving up
+MIGRATION_LOCK_TIMEOUT = int(os.getenv("MIGRATION_LOCK_TIMEOUT", "600"))
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+
+
+# --- Online DDL helpers (each one is a no-op if the change is already there) ---
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return column in {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _has_index(conn: Connection, table: str, name: str) -> bool:
+    return name in {i["name"] for i in inspect(conn).get_indexes(table)}
+
+
+def add_column(conn: Connection, table: str, column: str, ddl_type: str) -> None:
+    if _has_column(conn, table, column):
+        return
+    online = ", ALGORITHM=INPLACE, LOCK=NONE" if IS_MYSQL else ""
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type} NULL{online}"))
+    conn.commit()
+    print(f"✅ Added '{table}.{column}'.")
+
+
+def add_index(conn: Connection, table: str, name: str, columns: str) -> None:
+    if _has_index(conn, table, name):
+        return
+    online = " ALGORITHM=INPLACE LOCK=NONE" if IS_MYSQL else ""
+    conn.execute(text(f"CREATE INDEX {name} ON {table} ({columns}){online}"))
+    conn.commit()
+    print(f"✅ Created index '{name}'.")
+
+
+def drop_index(conn: Connection, table: str, name: str) -> None:
+    if not _has_index(conn, table, name):
+        return
+    online = f" ON {table} ALGORITHM=INPLACE LOCK=NONE" if IS_MYSQL else ""
+    conn.execute(text(f"DROP INDEX {name}{online}"))
+    conn.commit()
+    print(f"✅ Dropped index '{name}'.")
+
+
+def add_foreign_key(conn: Connection, table: str, name: str, column: str, target: str) -> None:
+    """MySQL only (SQLite cannot add constraints to an existing table)."""
+    if not IS_MYSQL or name in {fk["name"] for fk in inspect(conn).get_foreign_keys(table)}:
+        return
+    # INPLACE foreign keys need foreign_key_checks off; the values were just backfilled from the target
+    conn.execute(text("SET SESSION foreign_key_checks = 0"))
+    try:
+        conn.execute(text(
+            f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({column}) REFERENCES {target}, "
+            f"ALGORITHM=INPLACE, LOCK=NONE"
+        ))
+    finally:
+        conn.execute(text("SET SESSION foreign_key_checks = 1"))
+    conn.commit()
+    print(f"✅ Added foreign key '{name}'.")
+
+
+def backfill(conn: Connection, table: str, assignments: str, where: str) -> int:
+    """UPDATE table SET assignments WHERE where, in id ranges of MIGRATION_BATCH_SIZE rows."""
+    low, high = conn.execute(text(f"SELECT MIN(id), MAX(id) FROM {table}")).one()
+    if low is None:
+        return 0
+    total = 0
+    for start in range(low, high + 1, MIGRATION_BATCH_SIZE):
+        result = conn.execute(
+            text(f"UPDATE {table} SET {assignments} WHERE id >= :low AND id < :high AND ({where})"),
+            {"low": start, "high": start + MIGRATION_BATCH_SIZE},
+        )
+        conn.commit()
+        total += result.rowcount
+    if total:
+        print(f"✅ Backfilled {total} '{table}' rows.")
+    return total
+
+
+def _floor(expr: str) -> str:
+    # Both operands are non-negative here, so SQLite's integer cast is a floor
+    return f"FLOOR({expr})" if IS_MYSQL else f"CAST({expr} AS INTEGER)"
+
+
+# --- Versions ---
+def v2_risk_location_and_source(conn: Connection) -> None:
+    # Formerly fix_db.py + update_db_v2.py
+    add_column(conn, "risk_records", "latitude", "FLOAT")
+    add_column(conn, "risk_records", "longitude", "FLOAT")
+    add_column(conn, "risk_records", "source_title", "VARCHAR(255)")
+    add_column(conn, "risk_records", "published_date", "VARCHAR(50)")
+
+
+def v3_incremental_sweeps(conn: Connection) -> None:
+    add_column(conn, "risk_records", "last_seen", "DATETIME")
+    add_column(conn, "risk_records", "last_report_id", "INT")
+    add_index(conn, "risk_records", "ix_risk_records_source_url", "source_url")
+    backfill(
+        conn, "risk_records",
+        "last_seen = COALESCE(last_seen, (SELECT p.timestamp FROM patrol_reports p WHERE p.id = risk_records.report_id)), "
+        "last_report_id = COALESCE(last_report_id, report_id)",
+        "last_seen IS NULL OR last_report_id IS NULL",
+    )
+    add_foreign_key(conn, "risk_records", "fk_risk_last_report", "last_report_id", "patrol_reports(id)")
+
+
+def v4_latest_report_indexes(conn: Connection) -> None:
+    add_index(conn, "patrol_reports", "ix_patrol_reports_timestamp", "timestamp")
+    add_index(conn, "risk_records", "ix_risk_records_report_id", "report_id")
+    add_index(conn, "risk_records", "ix_risk_records_last_report_id", "last_report_id")
+
+
+def v5_risk_history(conn: Connection) -> None:
+    add_column(conn, "risk_records", "zone", "VARCHAR(255)")
+    add_column(conn, "risk_records", "timestamp", "DATETIME")
+    backfill(
+        conn, "risk_records",
+        "timestamp = (SELECT p.timestamp FROM patrol_reports p WHERE p.id = risk_records.report_id)",
+        "timestamp IS NULL",
+    )
+    # Temporary index: without it the per-row lookup below scans seen_sources for every risk
+    add_index(conn, "seen_sources", "ix_seen_sources_url", "url")
+    backfill(
+        conn, "risk_records",
+        "zone = (SELECT s.zone FROM seen_sources s WHERE s.url = risk_records.source_url LIMIT 1)",
+        "zone IS NULL",
+    )
+    drop_index(conn, "seen_sources", "ix_seen_sources_url")
+    add_index(conn, "risk_records", "ix_risk_records_ts_id", "timestamp, id")
+    add_index(conn, "risk_records", "ix_risk_records_zone_ts_id", "zone, timestamp, id")
+    add_index(conn, "risk_records", "ix_risk_records_threat_ts_id", "threat_type, timestamp, id")
+    add_index(conn, "risk_records", "ix_risk_records_score_ts_id", "risk_score, timestamp, id")
+
+
+def v6_spatial_grid(conn: Connection) -> None:
+    add_column(conn, "risk_records", "geo_cell", "INT")
+    # Same formula as app.geo.geo_cell
+    backfill(
+        conn, "risk_records",
+        f"geo_cell = {_floor(f'(latitude + 90) / {GEO_CELL_DEG}')} * {GRID_COLUMNS} "
+        f"+ {_floor(f'(longitude + 180) / {GEO_CELL_DEG}')}",
+        "geo_cell IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL",
+    )
+    add_index(conn, "risk_records", "ix_risk_records_cell_ts", "geo_cell, timestamp")
+    add_index(conn, "risk_records", "ix_risk_records_lat_ts", "latitude, timestamp")
+
+
+def v7_zone_registry(conn: Connection) -> None:
+    add_column(conn, "patrol_runs", "zones", "TEXT")
+
+
+def v8_daily_rollups(conn: Connection) -> None:
+    from app.rollups import rebuild_rollups
+    has_rollups = conn.execute(text("SELECT 1 FROM risk_daily_rollups LIMIT 1")).first()
+    if not has_rollups:
+        rebuild_rollups()
+
+
+def v9_report_scope(conn: Connection) -> None:
+    # Older reports stay NULL (scope unknown): the coordinator never reuses them
+    add_column(conn, "patrol_reports", "zones", "TEXT")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(2, "risk location and source columns", v2_risk_location_and_source),
+    Migration(3, "incremental sweeps", v3_incremental_sweeps),
+    Migration(4, "latest report indexes", v4_latest_report_indexes),
+    Migration(5, "risk history columns and indexes", v5_risk_history),
+    Migration(6, "spatial grid index", v6_spatial_grid),
+    Migration(7, "zone registry run scope", v7_zone_registry),
+    Migration(8, "daily rollup backfill", v8_daily_rollups),
+    Migration(9, "report scope", v9_report_scope),
+]
+
+
+# --- Runner ---
+@contextmanager
+def _sqlite_file_lock(database: Optional[str]):
+    # Processes sharing a SQLite file share a host: an flock on a sidecar file serialises them
+    if not database or database == ":memory:" or fcntl is None:
+        yield
+        return
+    with open(f"{database}.migrate.lock", "w") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+@contextmanager
+def migration_lock(conn: Connection):
+    """Serialises migrations across processes (MySQL named lock; flock next to a SQLite file)."""
+    if not IS_MYSQL:
+        with _sqlite_file_lock(conn.engine.url.database):
+            yield
+        return
+    acquired = conn.execute(
+        text("SELECT GET_LOCK('sentinel_schema_migrations', :timeout)"), {"timeout": MIGRATION_LOCK_TIMEOUT}
+    ).scalar()
+    if acquired != 1:
+        raise RuntimeError("Timed out waiting for another process to finish migrating")
+    try:
+        yield
+    finally:
+        conn.execute(text("SELECT RELEASE_LOCK('sentinel_schema_migrations')"))
+
+
+def applied_versions(conn: Connection) -> set:
+    return set(conn.execute(select(SchemaMigration.version)).scalars())
+
+
+def _record(conn: Connection, migration: Migration, duration_ms: int) -> None:
+    conn.execute(SchemaMigration.__table__.insert().values(
+        version=migration.version, name=migration.name,
+        applied_at=datetime.datetime.utcnow(), duration_ms=duration_ms,
+    ))
+    conn.commit()
+
+
+def run_migrations() -> List[int]:
+    """Creates missing tables, then applies every pending version in order. Returns the versions applied."""
+    applied_now = []
+    with engine.connect() as conn:
+        with migration_lock(conn):
+            Base.metadata.create_all(bind=conn)
+            conn.commit()
+            done = applied_versions(conn)
+            for migration in MIGRATIONS:
+                if migration.version in done:
+                    continue
+                print(f"🔧 Applying migration v{migration.version}: {migration.name}...")
+                started = time.perf_counter()
+                migration.apply(conn)
+                _record(conn, migration, int((time.perf_counter() - started) * 1000))
+                applied_now.append(migration.version)
+    if applied_now:
+        print(f"🎉 Schema migrated ({', '.join(f'v{v}' for v in applied_now)}).")
+    return applied_now
+
+
+def ensure_schema() -> None:
+    """
+    Called by init_db. A brand-new database gets the current schema from
+    create_all and every version is recorded as applied; an existing one is
+    migrated (AUTO_MIGRATE) or warned about.
+    """
+    fresh = not inspect(engine).has_table("patrol_reports")
+    if AUTO_MIGRATE and not fresh:
+        run_migrations()
+        return
+
+    with engine.connect() as conn:
+        with migration_lock(conn):
+            Base.metadata.create_all(bind=conn)
+            conn.commit()
+            # Read under the lock: a concurrent starter may have stamped the versions while we waited
+            done = applied_versions(conn)
+            pending = [m for m in MIGRATIONS if m.version not in done]
+            if fresh:
+                for migration in pending:
+                    _record(conn, migration, 0)
+        if pending and not fresh:
+            print(
+                f"⚠️ {len(pending)} schema migration(s) pending "
+                f"({', '.join(f'v{m.version}' for m in pending)}); run: python -m app.migrations"
+            )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="List applied and pending versions")
+    args = parser.parse_args(argv)
+
+    if not args.status:
+        if not run_migrations():
+            print("✅ Schema is up to date.")
+        return
+    Base.metadata.create_all(bind=engine, tables=[SchemaMigration.__table__])
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+    for migration in MIGRATIONS:
+        state = "applied" if migration.version in done else "pending"
+        print(f"  v{migration.version:<3} {state:<8} {migration.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+import base64
+import datetime
+import json
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, case, func, or_, select
+
+from app.database import AsyncSessionLocal, PatrolReport, RiskDailyRollup, RiskRecord, SweepTrace
+from app.geo import BBox, bbox_for_radius, cells_for_bbox, haversine_km
+from app.schemas import (
+    InfrastructureRisk, NearbyRisk, PatrolResponse, RiskPage, RiskSummary, SpatialResult, TrendGroup, TrendPoint, TrendReport,
+)
+
+# Upper bound for ?limit= on the history API
+MAX_PAGE_SIZE = 200
+
+# Upper bound for ?limit= on the spatial endpoints
+MAX_SPATIAL_RESULTS = 1000
+# Rows pulled from the index before the exact radius check
+MAX_SPATIAL_CANDIDATES = 5000
+
+# Upper bound for ?days= on /analytics/trends
+MAX_TREND_DAYS = 366
+# ?group_by= values for /analytics/trends
+TREND_DIMENSIONS = {
+    "zone": RiskDailyRollup.zone,
+    "threat_type": RiskDailyRollup.threat_type,
+    "risk_level": RiskDailyRollup.risk_level,
+}
+
+# Columns returned by the history API (no summaries/actions: those are TEXT blobs)
+RISK_SUMMARY_COLUMNS = (
+    RiskRecord.id,
+    RiskRecord.timestamp,
+    RiskRecord.zone,
+    RiskRecord.location,
+    RiskRecord.risk_level,
+    RiskRecord.risk_score,
+    RiskRecord.threat_type,
+    RiskRecord.latitude,
+    RiskRecord.longitude,
+    RiskRecord.source_url,
+    RiskRecord.source_title,
+)
+
+# High -> Low, evaluated by MySQL instead of re-sorting in Python
+RISK_PRIORITY = case(
+    {"High": 3, "Medium": 2, "Low": 1},
+    value=RiskRecord.risk_level,
+    else_=0,
+)
+
+
+async def _fetch_report_with_risks(report_id_clause) -> Optional[PatrolResponse]:
+    stmt = (
+        select(PatrolReport.id, PatrolReport.timestamp, PatrolReport.summary, RiskRecord)
+        .select_from(PatrolReport)
+        .outerjoin(RiskRecord, RiskRecord.last_report_id == PatrolReport.id)
+        .where(PatrolReport.id == report_id_clause)
+        .order_by(RISK_PRIORITY.desc(), RiskRecord.risk_score.desc(), RiskRecord.id)
+    )
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(stmt)).all()
+
+    if not rows:
+        return None
+    risks = [InfrastructureRisk.from_record(record) for *_, record in rows if record is not None]
+    report_id, timestamp, summary, _ = rows[0]
+    return PatrolResponse(summary=summary, risks=risks, report_id=report_id, timestamp=timestamp)
+
+
+async def fetch_latest_report(
+    newer_than: Optional[datetime.datetime] = None,
+    covering: Optional[List[str]] = None,
+) -> Optional[PatrolResponse]:
+    """
+    Latest report plus every risk it found or re-confirmed, in one round-trip:
+    the newest report id is a scalar subquery on the timestamp index, risks are
+    joined on last_report_id and ordered in the database.
+    With newer_than, returns None unless the latest report is at least that recent.
+    With covering, returns None unless the latest report scanned every one of
+    those zones (partial sweeps and reports of unknown scope never match).
+    """
+    latest_id = select(PatrolReport.id)
+    if newer_than is not None:
+        latest_id = latest_id.where(PatrolReport.timestamp >= newer_than)
+    latest_id = latest_id.order_by(PatrolReport.timestamp.desc(), PatrolReport.id.desc()).limit(1)
+
+    if covering is not None:
+        async with AsyncSessionLocal() as session:
+            latest = (await session.execute(
+                latest_id.with_only_columns(PatrolReport.id, PatrolReport.zones)
+            )).first()
+        if latest is None or latest.zones is None or not set(covering) <= set(json.loads(latest.zones)):
+            return None
+        return await _fetch_report_with_risks(latest.id)
+    return await _fetch_report_with_risks(latest_id.scalar_subquery())
+
+
+async def fetch_report(report_id: int) -> Optional[PatrolResponse]:
+    """
+    A specific report with the risks whose latest confirmation it was. For the
+    newest report that is the same set /patrol/latest shows.
+    """
+    return await _fetch_report_with_risks(report_id)
+
+
+async def fetch_sweep_trace(report_id: int) -> Optional[list]:
+    """Spans saved with a report (SWEEP_TRACES=true), or None."""
+    async with AsyncSessionLocal() as session:
+        trace = await session.get(SweepTrace, report_id)
+    return json.loads(trace.spans) if trace is not None and trace.spans else None
+
+
+def encode_cursor(timestamp: datetime.datetime, risk_id: int) -> str:
+    raw = f"{timestamp.isoformat()}|{risk_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    """Raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        timestamp, risk_id = raw.rsplit("|", 1)
+        return datetime.datetime.fromisoformat(timestamp), int(risk_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def risk_filters(
+    zone: Optional[str] = None,
+    threat_type: Optional[str] = None,
+    min_score: Optional[int] = None,
+    max_score: Optional[int] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+) -> list:
+    """WHERE clauses shared by the history, spatial and export queries."""
+    clauses = []
+    if zone:
+        clauses.append(RiskRecord.zone == zone)
+    if threat_type:
+        clauses.append(RiskRecord.threat_type == threat_type)
+    if min_score is not None:
+        clauses.append(RiskRecord.risk_score >= min_score)
+    if max_score is not None:
+        clauses.append(RiskRecord.risk_score <= max_score)
+    if since:
+        clauses.append(RiskRecord.timestamp >= since)
+    if until:
+        clauses.append(RiskRecord.timestamp < until)
+    return clauses
+
+
+def before_cursor(timestamp: datetime.datetime, risk_id: int):
+    """Keyset predicate for (timestamp, id) DESC, written so MySQL can range-scan the index."""
+    return or_(
+        RiskRecord.timestamp < timestamp,
+        and_(RiskRecord.timestamp == timestamp, RiskRecord.id < risk_id),
+    )
+
+
+def to_risk_summary(row, cls=RiskSummary, **extra) -> RiskSummary:
+    return cls(
+        **extra,
+        id=row.id,
+        timestamp=row.timestamp,
+        zone=row.zone,
+        location_identified=row.location,
+        risk_level=row.risk_level,
+        risk_score=row.risk_score,
+        threat_type=row.threat_type,
+        latitude=row.latitude,
+        longitude=row.longitude,
+        source_url=row.source_url,
+        source_title=row.source_title,
+    )
+
+
+async def fetch_risk_page(limit: int, cursor: Optional[str] = None, **filters) -> RiskPage:
+    """
+    One page of risk history, newest first, using keyset pagination on
+    (timestamp, id): cost depends on the page size, not on how deep the page is.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    clauses = risk_filters(**filters)
+    if cursor:
+        clauses.append(before_cursor(*decode_cursor(cursor)))
+
+    stmt = (
+        select(*RISK_SUMMARY_COLUMNS)
+        .where(*clauses)
+        .order_by(RiskRecord.timestamp.desc(), RiskRecord.id.desc())
+        .limit(limit + 1)  # One extra row tells us whether another page exists
+    )
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(stmt)).all()
+
+    items = [to_risk_summary(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last.timestamp, last.id)
+    return RiskPage(items=items, next_cursor=next_cursor)
+
+
+async def summarize_risk_history(since: datetime.datetime, zone: Optional[str] = None) -> dict:
+    """Aggregate counts since a date (whole UTC days, per zone/level and per threat type), read from the daily rollups."""
+    clauses = [RiskDailyRollup.day >= since.date()]
+    if zone:
+        clauses.append(RiskDailyRollup.zone == zone)
+    risk_count = func.sum(RiskDailyRollup.risk_count)
+    by_zone = (
+        select(RiskDailyRollup.zone, RiskDailyRollup.risk_level, risk_count, func.max(RiskDailyRollup.max_score))
+        .where(*clauses)
+        .group_by(RiskDailyRollup.zone, RiskDailyRollup.risk_level)
+    )
+    by_threat = (
+        select(RiskDailyRollup.threat_type, risk_count)
+        .where(*clauses)
+        .group_by(RiskDailyRollup.threat_type)
+        .order_by(risk_count.desc())
+    )
+    reports = select(func.count(PatrolReport.id), func.max(PatrolReport.timestamp)).where(PatrolReport.timestamp >= since)
+    async with AsyncSessionLocal() as session:
+        zone_rows = (await session.execute(by_zone)).all()
+        threat_rows = (await session.execute(by_threat)).all()
+        report_count, last_report = (await session.execute(reports)).one()
+
+    zones = {}
+    for zone_name, level, count, max_score in zone_rows:
+        entry = zones.setdefault(zone_name or "Unknown", {"total": 0, "by_level": {}, "max_score": 0})
+        entry["total"] += int(count)
+        entry["by_level"][level or "Unknown"] = int(count)
+        entry["max_score"] = max(entry["max_score"], max_score or 0)
+    return {
+        "since": since.isoformat(),
+        "reports": report_count,
+        "last_report": last_report.isoformat() if last_report else None,
+        "new_risks": sum(entry["total"] for entry in zones.values()),
+        "zones": zones,
+        "threat_types": {threat or "Unknown": int(count) for threat, count in threat_rows},
+    }
+
+
+async def fetch_risk_trends(
+    days: int,
+    group_by: Optional[str] = None,
+    zone: Optional[str] = None,
+    threat_type: Optional[str] = None,
+) -> TrendReport:
+    """
+    New risks per UTC day over the last `days` days (optionally one series per
+    zone, threat type or risk level) plus per-group totals and week-over-week
+    change. Reads only risk_daily_rollups: cost grows with days x groups, not
+    with stored history.
+    """
+    days = max(1, min(days, MAX_TREND_DAYS))
+    today = datetime.datetime.utcnow().date()
+    since = today - datetime.timedelta(days=days - 1)
+    # Week-over-week always needs the last 14 days, even for shorter windows
+    first = min(since, today - datetime.timedelta(days=13))
+
+    dimension = TREND_DIMENSIONS[group_by] if group_by else None
+    keys = [dimension] if dimension is not None else []
+    clauses = [RiskDailyRollup.day >= first, RiskDailyRollup.day <= today]
+    if zone:
+        clauses.append(RiskDailyRollup.zone == zone)
+    if threat_type:
+        clauses.append(RiskDailyRollup.threat_type == threat_type)
+    stmt = (
+        select(
+            RiskDailyRollup.day, *keys,
+            func.sum(RiskDailyRollup.risk_count),
+            func.sum(RiskDailyRollup.score_sum),
+            func.max(RiskDailyRollup.max_score),
+        )
+        .where(*clauses)
+        .group_by(RiskDailyRollup.day, *keys)
+        .order_by(RiskDailyRollup.day, *keys)
+    )
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(stmt)).all()
+
+    week_start = today - datetime.timedelta(days=6)
+    previous_week_start = today - datetime.timedelta(days=13)
+    points, groups = [], {}
+    for row in rows:
+        day, key = row[0], (row[1] or "Unknown") if dimension is not None else None
+        count, score_sum, max_score = int(row[-3]), int(row[-2]), row[-1]
+        group = groups.setdefault(key, {"risks": 0, "score_sum": 0, "max_score": None, "last": 0, "previous": 0})
+        if day >= week_start:
+            group["last"] += count
+        elif day >= previous_week_start:
+            group["previous"] += count
+        if day < since:
+            continue
+        points.append(TrendPoint(
+            day=day, key=key, risks=count,
+            avg_score=round(score_sum / count, 2) if count else None, max_score=max_score,
+        ))
+        group["risks"] += count
+        group["score_sum"] += score_sum
+        group["max_score"] = max(group["max_score"] or 0, max_score or 0)
+
+    summaries = [
+        TrendGroup(
+            key=key,
+            risks=g["risks"],
+            avg_score=round(g["score_sum"] / g["risks"], 2) if g["risks"] else None,
+            max_score=g["max_score"],
+            last_7_days=g["last"],
+            previous_7_days=g["previous"],
+            week_over_week=round((g["last"] - g["previous"]) / g["previous"], 3) if g["previous"] else None,
+        )
+        for key, g in groups.items()
+    ]
+    summaries.sort(key=lambda g: g.risks, reverse=True)
+    return TrendReport(since=since, until=today, group_by=group_by, points=points, groups=summaries)
+
+
+async def _fetch_in_bbox(bbox: BBox, limit: int, **filters) -> list:
+    """
+    Index-pruned candidate rows inside bbox, newest first. The IN-list of grid
+    cells hits the (geo_cell, timestamp) index; the lat/lng bounds then make
+    the box exact.
+    """
+    min_lat, min_lng, max_lat, max_lng = bbox
+    clauses = risk_filters(**filters)
+    clauses += [
+        RiskRecord.latitude.between(min_lat, max_lat),
+        RiskRecord.longitude.between(min_lng, max_lng),
+    ]
+    cells = cells_for_bbox(bbox)
+    if cells is not None:
+        clauses.append(RiskRecord.geo_cell.in_(cells))
+
+    stmt = (
+        select(*RISK_SUMMARY_COLUMNS)
+        .where(*clauses)
+        .order_by(RiskRecord.timestamp.desc(), RiskRecord.id.desc())
+        .limit(limit)
+    )
+    async with AsyncSessionLocal() as session:
+        return (await session.execute(stmt)).all()
+
+
+async def fetch_risks_in_bbox(bbox: BBox, limit: int, **filters) -> SpatialResult:
+    limit = max(1, min(limit, MAX_SPATIAL_RESULTS))
+    rows = await _fetch_in_bbox(bbox, limit + 1, **filters)
+    items = [to_risk_summary(row, NearbyRisk) for row in rows[:limit]]
+    return SpatialResult(items=items, truncated=len(rows) > limit)
+
+
+async def fetch_risks_nearby(lat: float, lng: float, radius_km: float, limit: int, **filters) -> SpatialResult:
+    """Risks within radius_km, nearest first: grid-cell prune, then exact haversine."""
+    limit = max(1, min(limit, MAX_SPATIAL_RESULTS))
+    rows = await _fetch_in_bbox(bbox_for_radius(lat, lng, radius_km), MAX_SPATIAL_CANDIDATES + 1, **filters)
+    truncated = len(rows) > MAX_SPATIAL_CANDIDATES
+
+    matches = []
+    for row in rows[:MAX_SPATIAL_CANDIDATES]:
+        distance = haversine_km(lat, lng, row.latitude, row.longitude)
+        if distance <= radius_km:
+            matches.append((distance, row))
+    matches.sort(key=lambda m: m[0])
+
+    items = [to_risk_summary(row, NearbyRisk, distance_km=round(d, 3)) for d, row in matches[:limit]]
+    return SpatialResult(items=items, truncated=truncated or len(matches) > limit)
@@ -0,0 +1,147 @@
+import re
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from app.context import RELEVANCE_TERMS
+
+# --- Gazetteer ---
+# States whose bare name is also a common word or a foreign place (Niger
+# republic, river deltas, ...) only count as "<name> state"
+NIGERIAN_STATES = (
+    "abia", "adamawa", "akwa ibom", "anambra", "bauchi", "bayelsa", "benue", "borno",
+    "cross river", "delta state", "ebonyi", "edo", "ekiti", "enugu", "gombe", "imo state",
+    "jigawa", "kaduna", "kano", "katsina", "kebbi", "kogi", "kwara", "lagos", "nasarawa",
+    "niger state", "ogun", "ondo", "osun", "oyo", "plateau state", "rivers state", "sokoto",
+    "taraba", "yobe", "zamfara", "fct", "federal capital territory",
+)
+# Short or ambiguous town names ("ore", "epe", "aba", "jos") are left out:
+# articles about them name their state, Lagos or a corridor as well
+NIGERIAN_PLACES = (
+    "nigeria", "nigerian", "abuja", "ibadan", "port harcourt", "abeokuta", "lekki",
+    "ikeja", "ikorodu", "ajah", "sagamu", "benin city", "uyo", "calabar", "zaria",
+    "owerri", "onitsha", "warri", "ilorin", "maiduguri", "asaba", "akure",
+    "ferma", "fmw", "lasg",
+)
+# Places/markers that put an article out of scope unless Nigeria is also mentioned
+FOREIGN_MARKERS = (
+    "united kingdom", "uk", "england", "scotland", "wales", "leicestershire",
+    "melton mowbray", "london", "united states", "usa", "canada", "australia",
+    "india", "ghana", "kenya", "south africa",
+    "niger republic", "republic of niger", "niamey", "benin republic", "republic of benin",
+    "cotonou", "porto-novo", "cameroon", "togo",
+)
+FOREIGN_TLDS = (".uk", ".us", ".ca", ".au", ".in", ".gh", ".ke", ".za")
+TRACKING_PARAMS = {"fbclid", "gclid", "ref", "amp", "outputtype"}
+# Words too generic to identify a specific corridor
+GENERIC_ZONE_WORDS = {"expressway", "road", "route", "fiber", "fibre", "highway", "state"}
+
+
+def _pattern(terms) -> re.Pattern:
+    return re.compile(r"\b(" + "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)) + r")\b")
+
+
+_NIGERIA_RE = _pattern(NIGERIAN_STATES + NIGERIAN_PLACES)
+_FOREIGN_RE = _pattern(FOREIGN_MARKERS)
+
+
+def _corridor_phrases(zone: str) -> List[str]:
+    """
+    "Port Harcourt-Enugu Expressway" -> ["port harcourt", "harcourt enugu"]:
+    adjacent word pairs of the zone name, never single words ("port", "ore"
+    and "kwa" alone match articles from anywhere).
+    """
+    words = [w for w in re.split(r"[\s\-]+", zone.lower()) if w and w not in GENERIC_ZONE_WORDS]
+    if len(words) == 1:
+        return words if len(words[0]) > 3 else []
+    return [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def _phrase_pattern(phrases) -> re.Pattern:
+    # "benin ore" also matches "Benin-Ore" and URL slugs like "benin-ore-road"
+    alternatives = (
+        r"[\s\-]+".join(re.escape(w) for w in phrase.split())
+        for phrase in sorted(phrases, key=len, reverse=True)
+    )
+    return re.compile(r"\b(" + "|".join(alternatives) + r")\b")
+
+
+def canonical_url(url: str) -> str:
+    """Lower-cases the host, drops www/fragments/tracking params and trailing slashes."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode([
+        (k, v) for k, v in parse_qsl(parts.query)
+        if not (k.lower().startswith("utm_") or k.lower() in TRACKING_PARAMS)
+    ])
+    return urlunsplit(("https", host, parts.path.rstrip("/"), query, ""))
+
+
+def _normalize_title(title: Optional[str]) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", (title or "").lower()).strip()
+
+
+class RelevanceFilter:
+    """
+    Cheap local pruning between the Tavily search and the Jina/LLM stages.
+    One instance per sweep: it remembers URLs/headlines per zone for dedup
+    (an article relevant to two corridors is analyzed for both) and keeps
+    counters of what it dropped and why.
+    """
+
+    def __init__(self, zones: List[str]):
+        corridor_phrases = {phrase for zone in zones for phrase in _corridor_phrases(zone)}
+        self._corridor_re = _phrase_pattern(corridor_phrases) if corridor_phrases else None
+        self._seen_urls: Set[Tuple[str, str]] = set()  # (zone, canonical url)
+        self._seen_titles: Set[Tuple[str, str]] = set()  # (zone, normalized title)
+        self.counters: Dict[str, int] = {
+            "searched": 0,
+            "duplicate_url": 0,
+            "duplicate_title": 0,
+            "out_of_country": 0,
+            "off_topic": 0,
+            "kept": 0,
+        }
+
+    def _in_country(self, text: str, host: str) -> bool:
+        # A Nigerian domain or an explicit state/city outweighs foreign markers
+        if host.endswith(".ng") or _NIGERIA_RE.search(text):
+            return True
+        if host.endswith(FOREIGN_TLDS) or _FOREIGN_RE.search(text):
+            return False
+        # Corridor names only vouch for articles with no foreign marker at all
+        return bool(self._corridor_re and self._corridor_re.search(text))
+
+    def reject_reason(self, zone: str, result: dict) -> Optional[str]:
+        """Returns why a search result for zone should be dropped, or None to keep it."""
+        url = canonical_url(result["url"])
+        if (zone, url) in self._seen_urls:
+            return "duplicate_url"
+
+        title = _normalize_title(result.get("title"))
+        # Short titles ("Home", "News") are too generic to treat as syndication
+        if len(title) > 20 and (zone, title) in self._seen_titles:
+            return "duplicate_title"
+
+        host = urlsplit(url).netloc
+        text = f"{result.get('title') or ''} {result.get('content') or ''} {url}".lower()
+        if not self._in_country(text, host):
+            return "out_of_country"
+        if not any(term in text for term in RELEVANCE_TERMS):
+            return "off_topic"
+        return None
+
+    def filter(self, zone: str, results: List[dict]) -> List[dict]:
+        kept = []
+        for result in results:
+            self.counters["searched"] += 1
+            reason = self.reject_reason(zone, result)
+            if reason:
+                self.counters[reason] += 1
+                continue
+            self._seen_urls.add((zone, canonical_url(result["url"])))
+            self._seen_titles.add((zone, _normalize_title(result.get("title"))))
+            self.counters["kept"] += 1
+            kept.append(result)
+        return kept
@@ -0,0 +1,73 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import Awaitable, Callable, Optional, Tuple
+
+from app.queries import fetch_latest_report
+
+# Safety net for other processes' writes: this cache is invalidated explicitly
+# by run_patrol_and_save, but only inside the process that ran the sweep.
+LATEST_CACHE_TTL = float(os.getenv("LATEST_CACHE_TTL", "30"))
+
+CachedBody = Tuple[bytes, str]  # (JSON body, ETag)
+
+
+class ResponseCache:
+    """
+    In-process cache of one serialized response plus its ETag.
+    Concurrent misses share a single load (the lock), so a burst of dashboard
+    polls right after invalidation costs one query.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entry: Optional[CachedBody] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def get(self) -> Optional[CachedBody]:
+        if self._entry is not None and time.monotonic() < self._expires_at:
+            return self._entry
+        return None
+
+    async def get_or_load(self, loader: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[CachedBody]:
+        cached = self.get()
+        if cached is not None:
+            return cached
+        async with self._lock:
+            cached = self.get()
+            if cached is not None:
+                return cached
+            body = await loader()
+            if body is None:
+                return None
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            self._entry = (body, etag)
+            self._expires_at = time.monotonic() + self.ttl
+            return self._entry
+
+    def invalidate(self) -> None:
+        self._entry = None
+        self._expires_at = 0.0
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Handles lists and weak validators (W/"...") in If-None-Match."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+latest_report_cache = ResponseCache(LATEST_CACHE_TTL)
+
+
+async def _load_latest_report() -> Optional[bytes]:
+    report = await fetch_latest_report()
+    return report.model_dump_json().encode() if report else None
+
+
+async def cached_latest_report() -> Optional[CachedBody]:
+    """The latest report as served by /patrol/latest (shared with the chat agent's tools)."""
+    return await latest_report_cache.get_or_load(_load_latest_report)
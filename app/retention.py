@@ -0,0 +1,199 @@
+"""
+Retention: moves reports (and the risks last confirmed by them) older than
+RETENTION_DAYS out of the hot tables into patrol_reports_archive /
+risk_records_archive, RETENTION_BATCH_SIZE reports per transaction.
+
+    python -m app.retention             # archive now
+    python -m app.retention --dry-run   # only count what would move
+
+Foreign keys decide what can move:
+  - a risk moves once its last_report_id (its latest confirmation) is old;
+  - a report moves once no remaining risk points at it (report_id or
+    last_report_id); risks still being re-confirmed keep their first report;
+  - sweep traces of moved reports are dropped; patrol runs pointing at them
+    keep their row with report_id cleared (finished runs past the cutoff and
+    seen sources not seen since are deleted outright);
+  - the newest report is never archived (/patrol/latest reads it).
+Daily rollups are left alone, so trends keep their full history.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+from typing import List
+
+from sqlalchemy import delete, exists, func, insert, literal, or_, select, update
+
+from app.database import (
+    IS_MYSQL, ArchivedReport, ArchivedRisk, AsyncSessionLocal, PatrolReport, PatrolRun, RiskRecord,
+    SeenSource, SweepTrace,
+)
+
+# --- Settings ---
+# Reports older than this many days are archived (0 disables the job)
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "180"))
+# Reports per transaction: small batches keep row locks short on the hot tables
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "200"))
+# Pause between batches so sweeps and API reads get the database in between
+RETENTION_PAUSE_SECONDS = float(os.getenv("RETENTION_PAUSE_SECONDS", "0.5"))
+
+ARCHIVED_RISK_COLUMNS = [
+    "id", "report_id", "last_report_id", "timestamp", "last_seen", "zone", "location", "risk_level",
+    "risk_score", "threat_type", "latitude", "longitude", "source_url", "source_title", "published_date",
+]
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+async def _archive_batch(session, report_ids: List[int], now: datetime.datetime) -> dict:
+    """Moves what it can for these (old) reports. Runs in the caller's transaction."""
+    # Risks whose latest confirmation is one of these reports (legacy rows: their own report)
+    risk_ids = select(RiskRecord.id).where(or_(
+        RiskRecord.last_report_id.in_(report_ids),
+        (RiskRecord.last_report_id.is_(None)) & RiskRecord.report_id.in_(report_ids),
+    ))
+    if IS_MYSQL:
+        # Locking read: a sweep re-confirming one of these rows waits instead of racing the move
+        risk_ids = risk_ids.with_for_update()
+    risk_ids = list((await session.execute(risk_ids)).scalars())
+
+    if risk_ids:
+        columns = [getattr(RiskRecord, name) for name in ARCHIVED_RISK_COLUMNS]
+        await session.execute(
+            insert(ArchivedRisk).from_select(
+                [*ARCHIVED_RISK_COLUMNS, "archived_at"],
+                select(*columns, literal(now)).where(RiskRecord.id.in_(risk_ids)),
+            )
+        )
+        await session.execute(delete(RiskRecord).where(RiskRecord.id.in_(risk_ids)))
+
+    # Reports nothing points at any more
+    still_referenced = exists().where(or_(
+        RiskRecord.report_id == PatrolReport.id,
+        RiskRecord.last_report_id == PatrolReport.id,
+    ))
+    movable = list((await session.execute(
+        select(PatrolReport.id).where(PatrolReport.id.in_(report_ids), ~still_referenced)
+    )).scalars())
+
+    if movable:
+        first_found = (
+            select(func.count(ArchivedRisk.id))
+            .where(ArchivedRisk.report_id == PatrolReport.id)
+            .scalar_subquery()
+        )
+        await session.execute(
+            insert(ArchivedReport).from_select(
+                ["id", "timestamp", "summary", "risk_count", "archived_at"],
+                select(PatrolReport.id, PatrolReport.timestamp, PatrolReport.summary, first_found, literal(now))
+                .where(PatrolReport.id.in_(movable)),
+            )
+        )
+        await session.execute(delete(SweepTrace).where(SweepTrace.report_id.in_(movable)))
+        await session.execute(
+            update(PatrolRun).where(PatrolRun.report_id.in_(movable)).values(report_id=None)
+        )
+        await session.execute(delete(PatrolReport).where(PatrolReport.id.in_(movable)))
+
+    return {"risks": len(risk_ids), "reports": len(movable)}
+
+
+async def _prune(model, clause) -> int:
+    """Deletes matching rows RETENTION_BATCH_SIZE * 10 at a time (no archive copy)."""
+    batch = RETENTION_BATCH_SIZE * 10
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                ids = list((await session.execute(select(model.id).where(clause).limit(batch))).scalars())
+                if ids:
+                    await session.execute(delete(model).where(model.id.in_(ids)))
+        total += len(ids)
+        if len(ids) < batch:
+            return total
+        await asyncio.sleep(RETENTION_PAUSE_SECONDS)
+
+
+async def count_archivable(cutoff: datetime.datetime) -> dict:
+    async with AsyncSessionLocal() as session:
+        latest_id = await session.scalar(select(func.max(PatrolReport.id)))
+        reports = await session.scalar(
+            select(func.count(PatrolReport.id)).where(PatrolReport.timestamp < cutoff, PatrolReport.id != latest_id)
+        )
+        risks = await session.scalar(select(func.count(RiskRecord.id)).where(RiskRecord.last_seen < cutoff))
+    return {"reports": reports, "risks": risks}
+
+
+async def archive_old_reports(days: int = None, dry_run: bool = False) -> dict:
+    """Archives everything older than `days` (default RETENTION_DAYS), batch by batch. Returns totals."""
+    days = RETENTION_DAYS if days is None else days
+    totals = {"reports": 0, "risks": 0, "seen_sources": 0, "runs": 0}
+    if days <= 0:
+        return totals
+    cutoff = _utcnow() - datetime.timedelta(days=days)
+    if dry_run:
+        return await count_archivable(cutoff)
+
+    print(f"🗄️ Retention: archiving reports older than {cutoff:%Y-%m-%d} ({days} days)...")
+    after_id = 0
+    while True:
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                latest_id = await session.scalar(select(func.max(PatrolReport.id)))
+                report_ids = list((await session.execute(
+                    select(PatrolReport.id)
+                    .where(PatrolReport.id > after_id, PatrolReport.timestamp < cutoff, PatrolReport.id != latest_id)
+                    .order_by(PatrolReport.id)
+                    .limit(RETENTION_BATCH_SIZE)
+                )).scalars())
+                if not report_ids:
+                    break
+                moved = await _archive_batch(session, report_ids, _utcnow())
+        # Reports kept back (still referenced) are skipped by the id cursor until a later run
+        after_id = report_ids[-1]
+        totals["reports"] += moved["reports"]
+        totals["risks"] += moved["risks"]
+        await asyncio.sleep(RETENTION_PAUSE_SECONDS)
+
+    # Sources not seen since the cutoff: if they reappear, their risks are new again
+    totals["seen_sources"] = await _prune(SeenSource, SeenSource.last_seen < cutoff)
+    totals["runs"] = await _prune(PatrolRun, PatrolRun.finished_at < cutoff)
+
+    print(
+        f"✅ Retention: archived {totals['reports']} reports, {totals['risks']} risks; "
+        f"pruned {totals['seen_sources']} seen sources, {totals['runs']} finished runs."
+    )
+    return totals
+
+
+async def scheduled_retention() -> None:
+    # One runner across API replicas / sweep workers
+    from app.coordinator import SweepLeaseLock
+    lock = SweepLeaseLock("retention")
+    if not await lock.acquire():
+        print("🔗 Retention already running elsewhere; skipping.")
+        return
+    renewer = asyncio.create_task(lock.keep_alive())
+    try:
+        await archive_old_reports()
+    except Exception as e:
+        print(f"❌ Retention failed: {e}")
+    finally:
+        renewer.cancel()
+        await lock.release()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=None, help=f"Override RETENTION_DAYS ({RETENTION_DAYS})")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args(argv)
+    result = asyncio.run(archive_old_reports(args.days, dry_run=args.dry_run))
+    if args.dry_run:
+        print(f"🔎 Would archive up to {result['reports']} reports and {result['risks']} risks.")
+
+
+if __name__ == "__main__":
+    main()
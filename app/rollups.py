@@ -0,0 +1,134 @@
+"""
+Daily risk rollups: new risks per UTC day, zone, threat type and risk level.
+
+save_report adds each sweep's new risks inside its own transaction, so trend
+queries (/analytics/trends, the agent's history summary) never scan
+risk_records. Rebuild from the raw rows after a schema change, a manual data
+fix, or when enabling this on an existing database:
+
+    python -m app.rollups                      # every day with risks
+    python -m app.rollups --since 2025-01-01   # from a given day on
+
+Run the rebuild while no sweep is saving: a sweep that commits into the window
+being rebuilt can be counted twice.
+"""
+import argparse
+import datetime
+import os
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import IS_MYSQL, RiskDailyRollup, RiskRecord, engine
+from app.schemas import InfrastructureRisk
+
+# Days rebuilt per transaction by the backfill, so no single DELETE/INSERT holds locks for long
+ROLLUP_BACKFILL_DAYS = int(os.getenv("ROLLUP_BACKFILL_DAYS", "31"))
+
+rollups = RiskDailyRollup.__table__
+ROLLUP_KEY = ("day", "zone", "threat_type", "risk_level")
+
+
+def rollup_rows(risks: Iterable[InfrastructureRisk], day: datetime.date) -> List[dict]:
+    """One row per (zone, threat type, level) in risks, sorted so concurrent upserts lock in the same order."""
+    totals = {}
+    for risk in risks:
+        key = ((risk.zone or "")[:255], (risk.threat_type or "")[:255], (risk.risk_level or "")[:50])
+        row = totals.setdefault(key, {
+            "day": day, "zone": key[0], "threat_type": key[1], "risk_level": key[2],
+            "risk_count": 0, "score_sum": 0, "max_score": 0,
+        })
+        score = risk.risk_score or 0
+        row["risk_count"] += 1
+        row["score_sum"] += score
+        row["max_score"] = max(row["max_score"], score)
+    return [totals[key] for key in sorted(totals)]
+
+
+def _upsert():
+    """INSERT that adds to an existing (day, zone, threat_type, risk_level) row instead of failing."""
+    if IS_MYSQL:
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(rollups)
+        return stmt.on_duplicate_key_update(
+            risk_count=rollups.c.risk_count + stmt.inserted.risk_count,
+            score_sum=rollups.c.score_sum + stmt.inserted.score_sum,
+            max_score=func.greatest(rollups.c.max_score, stmt.inserted.max_score),
+        )
+    from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+    stmt = sqlite_insert(rollups)
+    return stmt.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEY),
+        set_={
+            "risk_count": rollups.c.risk_count + stmt.excluded.risk_count,
+            "score_sum": rollups.c.score_sum + stmt.excluded.score_sum,
+            "max_score": func.max(rollups.c.max_score, stmt.excluded.max_score),
+        },
+    )
+
+
+async def add_to_rollups(session: AsyncSession, risks: List[InfrastructureRisk], now: datetime.datetime) -> None:
+    """Adds newly inserted risks to today's rollups (runs in the caller's transaction)."""
+    rows = rollup_rows(risks, now.date())
+    if rows:
+        await session.execute(_upsert(), rows)
+
+
+def rebuild_rollups(since: Optional[datetime.date] = None) -> int:
+    """Recomputes the rollups from risk_records, ROLLUP_BACKFILL_DAYS per transaction. Returns rows written."""
+    with engine.connect() as conn:
+        first, last = conn.execute(select(func.min(RiskRecord.timestamp), func.max(RiskRecord.timestamp))).one()
+    if first is None:
+        print("📭 No risks stored; nothing to roll up.")
+        return 0
+
+    start = max(since, first.date()) if since else first.date()
+    end = last.date()
+    day = func.date(RiskRecord.timestamp)
+    zone = func.coalesce(RiskRecord.zone, "")
+    threat = func.coalesce(RiskRecord.threat_type, "")
+    level = func.coalesce(RiskRecord.risk_level, "")
+
+    written = 0
+    window = start
+    while window <= end:
+        window_end = window + datetime.timedelta(days=ROLLUP_BACKFILL_DAYS)
+        grouped = (
+            select(
+                day, zone, threat, level,
+                func.count(RiskRecord.id),
+                func.coalesce(func.sum(RiskRecord.risk_score), 0),
+                func.coalesce(func.max(RiskRecord.risk_score), 0),
+            )
+            .where(
+                RiskRecord.timestamp >= datetime.datetime.combine(window, datetime.time.min),
+                RiskRecord.timestamp < datetime.datetime.combine(window_end, datetime.time.min),
+            )
+            .group_by(day, zone, threat, level)
+        )
+        with engine.begin() as conn:
+            conn.execute(delete(rollups).where(rollups.c.day >= window, rollups.c.day < window_end))
+            result = conn.execute(insert(rollups).from_select(
+                [*ROLLUP_KEY, "risk_count", "score_sum", "max_score"], grouped,
+            ))
+        written += result.rowcount
+        print(f"📊 Rolled up {window} .. {min(window_end - datetime.timedelta(days=1), end)} ({result.rowcount} rows)")
+        window = window_end
+
+    # Days after the newest risk (e.g. its rows were deleted) must not keep old totals
+    with engine.begin() as conn:
+        conn.execute(delete(rollups).where(rollups.c.day > end))
+    return written
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--since", type=datetime.date.fromisoformat, help="First day to rebuild (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+    written = rebuild_rollups(args.since)
+    print(f"🎉 Daily rollups rebuilt ({written} rows).")
+
+
+if __name__ == "__main__":
+    main()
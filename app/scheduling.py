@@ -0,0 +1,42 @@
+import os
+from pytz import timezone
+
+# "fixed" (default): every zone on the same schedule.
+# "adaptive" (opt-in): every few minutes the zone registry decides which zones
+#   are due (hot zones often, quiet ones rarely, within API_CALL_BUDGET_PER_HOUR).
+SCHEDULE_MODE = os.getenv("SCHEDULE_MODE", "fixed").lower()
+# How often the adaptive scheduler checks for due zones
+ZONE_TICK_MINUTES = float(os.getenv("ZONE_TICK_MINUTES", "5"))
+# Hour (Lagos time) of the daily retention/archival job
+RETENTION_HOUR = int(os.getenv("RETENTION_HOUR", "3"))
+
+
+def add_sweep_schedule(scheduler, job, zone_job=None) -> None:
+    """
+    Registers the patrol schedule. Adaptive mode runs zone_job every
+    ZONE_TICK_MINUTES; fixed mode runs job daily at 7:00 Lagos time in
+    PRODUCTION, else every 10 minutes.
+    """
+    if SCHEDULE_MODE == "adaptive" and zone_job is not None:
+        scheduler.add_job(zone_job, 'interval', minutes=ZONE_TICK_MINUTES)
+        print(f"🕒 Scheduler: ADAPTIVE Mode (due zones checked every {ZONE_TICK_MINUTES:g} minutes)")
+        return
+
+    env_mode = os.getenv("ENVIRONMENT", "TESTING").upper()
+
+    # Define Nigeria Time
+    lagos_time = timezone('Africa/Lagos')
+
+    if env_mode == "PRODUCTION":
+        # Pass the timezone to the cron trigger
+        scheduler.add_job(job, 'cron', hour=7, minute=0, timezone=lagos_time)
+        print("🕒 Scheduler: PRODUCTION Mode (Daily at 7:00 AM Lagos Time)")
+    else:
+        scheduler.add_job(job, 'interval', minutes=10)
+        print("🕒 Scheduler: TESTING Mode (Every 10 minutes)")
+
+
+def add_maintenance_schedule(scheduler, job) -> None:
+    """Registers the daily retention job (RETENTION_HOUR, Lagos time: off-peak for sweeps and readers)."""
+    scheduler.add_job(job, 'cron', hour=RETENTION_HOUR, minute=30, timezone=timezone('Africa/Lagos'))
+    print(f"🕒 Scheduler: retention daily at {RETENTION_HOUR:02d}:30 Lagos Time")
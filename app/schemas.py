@@ -1,4 +1,7 @@
 from pydantic import BaseModel, Field
+from pydantic.json_schema import SkipJsonSchema
+import datetime
+import json
 from typing import List, Optional
 
 # --- Constants ---
@@ -40,6 +43,27 @@ class InfrastructureRisk(BaseModel):
     recommended_action: str = Field(description="Specific directive for patrol teams")
     latitude: Optional[float] = None
     longitude: Optional[float] = None
+    # Set by run_sweep / from_record; kept out of the JSON schema so the LLM's
+    # structured output (ZoneAnalysisResult) never asks the model to fill it
+    zone: SkipJsonSchema[Optional[str]] = None
+
+    @classmethod
+    def from_record(cls, r) -> "InfrastructureRisk":
+        """Builds the API model from a RiskRecord row."""
+        return cls(
+            risk_level=r.risk_level,
+            risk_score=r.risk_score if r.risk_score is not None else 0, # Fallback to 0
+            summary=r.summary if r.summary is not None else "No summary available", # Fallback string
+            location_identified=r.location,
+            threat_type=r.threat_type,
+            recommended_action=r.recommended_action,
+            latitude=r.latitude,
+            longitude=r.longitude,
+            source_url=r.source_url,
+            source_title=r.source_title,
+            published_date=r.published_date,
+            zone=r.zone
+        )
 
 class ZoneAnalysisResult(BaseModel):
     risks: List[InfrastructureRisk]
@@ -47,6 +71,121 @@ class ZoneAnalysisResult(BaseModel):
 class PatrolResponse(BaseModel):
     summary: str
     risks: List[InfrastructureRisk]
+    report_id: Optional[int] = None
+    timestamp: Optional[datetime.datetime] = None
+
+class RiskSummary(BaseModel):
+    """Compact projection of a stored risk for the history API."""
+    id: int
+    timestamp: Optional[datetime.datetime] = None
+    zone: Optional[str] = None
+    location_identified: Optional[str] = None
+    risk_level: Optional[str] = None
+    risk_score: Optional[int] = None
+    threat_type: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    source_url: Optional[str] = None
+    source_title: Optional[str] = None
+
+class RiskPage(BaseModel):
+    items: List[RiskSummary]
+    next_cursor: Optional[str] = Field(None, description="Pass back as ?cursor= for the next page")
+
+class NearbyRisk(RiskSummary):
+    distance_km: Optional[float] = None
+
+class SpatialResult(BaseModel):
+    items: List[NearbyRisk]
+    truncated: bool = Field(False, description="True if more matches exist than were returned")
+
+class TrendPoint(BaseModel):
+    day: datetime.date
+    key: Optional[str] = Field(None, description="Zone, threat type or risk level (None when not grouped)")
+    risks: int
+    avg_score: Optional[float] = None
+    max_score: Optional[int] = None
+
+class TrendGroup(BaseModel):
+    key: Optional[str] = None
+    risks: int = Field(..., description="New risks over the whole window")
+    avg_score: Optional[float] = None
+    max_score: Optional[int] = None
+    last_7_days: int = 0
+    previous_7_days: int = 0
+    week_over_week: Optional[float] = Field(None, description="Relative change, e.g. 0.25 = +25% (None if no previous week)")
+
+class TrendReport(BaseModel):
+    """Daily new-risk series read from the rollup tables (GET /analytics/trends)."""
+    since: datetime.date
+    until: datetime.date
+    group_by: Optional[str] = None
+    points: List[TrendPoint]
+    groups: List[TrendGroup]
+
+class PatrolRunStatus(BaseModel):
+    """State of a queued sweep (GET /patrol/runs/{id})."""
+    id: int
+    status: str
+    trigger: Optional[str] = None
+    extra_zone: Optional[str] = None
+    zones: Optional[List[str]] = Field(None, description="Zones scanned (None = every active zone)")
+    created_at: Optional[datetime.datetime] = None
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+    duration_seconds: Optional[float] = None
+    report_id: Optional[int] = Field(None, description="The PatrolReport this run produced (or reused)")
+    error: Optional[str] = None
+
+    @classmethod
+    def from_record(cls, r):
+        duration = None
+        if r.started_at and r.finished_at:
+            duration = round((r.finished_at - r.started_at).total_seconds(), 3)
+        return cls(
+            id=r.id,
+            status=r.status,
+            trigger=r.trigger,
+            extra_zone=r.extra_zone,
+            zones=json.loads(r.zones) if r.zones else None,
+            created_at=r.created_at,
+            started_at=r.started_at,
+            finished_at=r.finished_at,
+            duration_seconds=duration,
+            report_id=r.report_id,
+            error=r.error,
+        )
+
+class ZoneStatus(BaseModel):
+    """A registry zone and its adaptive schedule (GET /zones)."""
+    name: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    active: bool = True
+    heat: float = Field(0.0, description="0 = quiet, 1 = hot (recent risk scores and new sources)")
+    scan_interval_minutes: Optional[float] = None
+    last_scanned_at: Optional[datetime.datetime] = None
+    next_scan_at: Optional[datetime.datetime] = None
+
+    @classmethod
+    def from_record(cls, z):
+        return cls(
+            name=z.name,
+            latitude=z.latitude,
+            longitude=z.longitude,
+            active=z.active,
+            heat=z.heat or 0.0,
+            scan_interval_minutes=z.scan_interval_minutes,
+            last_scanned_at=z.last_scanned_at,
+            next_scan_at=z.next_scan_at,
+        )
+
+class ZoneRequest(BaseModel):
+    """Adds or updates a registry zone (POST /zones)."""
+    name: str = Field(..., min_length=2, max_length=255)
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+    active: bool = True
 
 class PatrolRequest(BaseModel):
     extra_zone: Optional[str] = None
@@ -1,59 +1,184 @@
+import os
+import json
+import time
+import datetime
 import traceback
-import asyncio
-from app.database import SessionLocal, PatrolReport, RiskRecord
-from app.tools import perform_patrol_sweep
-from app.schemas import PatrolResponse
+from typing import List, Optional, Tuple
+from sqlalchemy import func, insert, select, update
+from app.database import AsyncSessionLocal, PatrolReport, RiskRecord, SweepTrace
+from app.geo import geo_cell
+from app.incremental import SeenSourceIndex
+from app.metrics import SWEEP_RISKS, SWEEP_SECONDS, SWEEPS, TraceRecorder, observe_stage, trace_sweep, zone_label
+from app.report_cache import latest_report_cache
+from app.rollups import add_to_rollups
+from app.tools import EventCallback, emit, run_sweep
+from app.schemas import InfrastructureRisk, PatrolResponse
+from app.zones import active_zone_names, mark_scanned
 
-async def run_patrol_and_save(extra_zone: str = None) -> PatrolResponse:
+# Incremental mode only processes sources not seen in earlier sweeps
+INCREMENTAL_SWEEPS = os.getenv("INCREMENTAL_SWEEPS", "true").lower() == "true"
+
+def risk_to_row(risk: InfrastructureRisk, report_id: int, now: datetime.datetime) -> dict:
+    """Column values for one risk_records row (used by the bulk insert)."""
+    return {
+        "report_id": report_id,
+        "risk_level": risk.risk_level,    # Save string level here
+        "risk_score": risk.risk_score,    # Save integer score here
+        "summary": risk.summary,
+        "location": risk.location_identified,
+        "latitude": risk.latitude,
+        "longitude": risk.longitude,
+        "source_url": risk.source_url,
+        "source_title": risk.source_title,       # 🆕 Save headline
+        "published_date": risk.published_date,   # 🆕 Save date
+        "threat_type": risk.threat_type,
+        "recommended_action": risk.recommended_action,
+        "last_seen": now,
+        "last_report_id": report_id,
+        "zone": risk.zone,
+        "timestamp": now,
+        "geo_cell": geo_cell(risk.latitude, risk.longitude),
+    }
+
+async def carry_over_risks(session, report_id: int, zones: List[str]) -> List[RiskRecord]:
+    """Re-points the previous report's risks in these zones at report_id (one UPDATE) and returns them."""
+    previous_id = await session.scalar(select(func.max(PatrolReport.id)).where(PatrolReport.id < report_id))
+    if previous_id is None:
+        return []
+    rows = list((await session.execute(
+        select(RiskRecord).where(RiskRecord.last_report_id == previous_id, RiskRecord.zone.in_(zones))
+    )).scalars())
+    if rows:
+        await session.execute(
+            update(RiskRecord)
+            .where(RiskRecord.id.in_([row.id for row in rows]))
+            .values(last_report_id=report_id)
+            .execution_options(synchronize_session=False)
+        )
+    return rows
+
+async def save_report(
+    result: dict,
+    source_index: Optional[SeenSourceIndex],
+    trace: Optional[TraceRecorder] = None,
+    carry_over_zones: Optional[List[str]] = None,
+) -> Tuple[int, datetime.datetime, str, List[InfrastructureRisk]]:
+    """
+    Persists one sweep in a single transaction: the report row, one bulk INSERT
+    for new risks plus their daily rollups, (incremental mode) the
+    last_seen/seen_sources updates, and the sweep's trace spans when tracing is on.
+    A partial sweep passes the zones it did not scan as carry_over_zones: their
+    risks in the previous report move to this one (last_seen is untouched), so
+    the latest report always covers every active zone.
+    Returns (report_id, timestamp, summary, active_risks).
+    """
+    new_risks = result["risks"]
+    known_risks = []
+    if source_index is not None:
+        new_risks = [r for r in result["risks"] if not source_index.is_known(r)]
+        known_risks = [r for r in result["risks"] if source_index.is_known(r)]
+
+    started = time.perf_counter()
+    now = datetime.datetime.utcnow()
+    summary = result["summary"]
+    active_risks = list(new_risks)
+
+    # Timed as one stage: the whole transaction, commit included
+    with observe_stage("db_commit"):
+        async with AsyncSessionLocal() as session:
+            async with session.begin():
+                new_report = PatrolReport(summary=summary, timestamp=now, zones=json.dumps(sorted(result["zones"])))
+                session.add(new_report)
+                await session.flush()
+
+                if new_risks:
+                    await session.execute(insert(RiskRecord), [risk_to_row(r, new_report.id, now) for r in new_risks])
+                    await add_to_rollups(session, new_risks, now)
+
+                if source_index is not None:
+                    touched = await source_index.touch(session, new_report.id, known_risks, now)
+                    await source_index.record(session, now)
+                    active_risks += [InfrastructureRisk.from_record(r) for r in touched]
+                    summary = (
+                        f"Sweep complete. Identified {len(new_risks)} new risks "
+                        f"({len(touched)} still active)."
+                    )
+                    new_report.summary = summary
+
+                if carry_over_zones:
+                    carried = await carry_over_risks(session, new_report.id, carry_over_zones)
+                    active_risks += [InfrastructureRisk.from_record(r) for r in carried]
+                    summary = f"{summary} {len(carried)} risks carried over from zones not scanned this time."
+                    new_report.summary = summary
+
+                if trace is not None:
+                    session.add(SweepTrace(report_id=new_report.id, spans=trace.to_json()))
+            report_id = new_report.id
+
+    # The dashboard cache must never serve the previous report once this one is committed
+    latest_report_cache.invalidate()
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"💾 Persisted report {report_id} ({len(new_risks)} new rows) in {elapsed_ms:.0f} ms")
+    return report_id, now, summary, active_risks
+
+async def run_patrol_and_save(
+    extra_zone: str = None,
+    incremental: bool = None,
+    on_event: Optional[EventCallback] = None,
+    zones: Optional[List[str]] = None,
+) -> PatrolResponse:
     """
-    Tactical Update: This function is now ASYNC to support the 
+    Tactical Update: This function is now ASYNC to support the
     asynchronous LangChain tools and Telegram alerts.
+    In incremental mode, known risks are re-confirmed (last_seen) instead of re-inserted.
+    With zones (adaptive schedule) only those are scanned; the other zones' risks carry over.
+    on_event receives the sweep's progress events plus a final "summary" once saved.
     """
-    print(f"⏳ Starting patrol sweep (Extra Zone: {extra_zone})...")
-    
+    if incremental is None:
+        incremental = INCREMENTAL_SWEEPS
+    scope = f"Zones: {', '.join(zones)}" if zones is not None else "All zones"
+    print(f"⏳ Starting patrol sweep ({scope}, Extra Zone: {extra_zone}, Incremental: {incremental})...")
+
+    started = time.perf_counter()
     try:
-        # 1. Use 'ainvoke' and 'await' for async tools
-        # result will be the dict returned by perform_patrol_sweep
-        result = await perform_patrol_sweep.ainvoke({"extra_zone": extra_zone})
-        
-        # 2. Database Operation
-        # Note: If your DB setup is still sync, we use it inside the async function
-        db = SessionLocal()
-        try:
-            new_report = PatrolReport(summary=result["summary"])
-            db.add(new_report)
-            db.flush() 
-
-            for risk in result["risks"]:
-                db_risk = RiskRecord(
-                    report_id=new_report.id,
-                    risk_level=risk.risk_level,  # Corrected: Save string level here
-                    risk_score=risk.risk_score,  # Corrected: Save integer score here
-                    summary=risk.summary,        # Corrected: Save the summary!
-                    location=risk.location_identified,
-                    latitude=risk.latitude,
-                    longitude=risk.longitude,
-                    source_url=risk.source_url,
-                    source_title=risk.source_title,   # 🆕 Save headline
-                    published_date=risk.published_date,# 🆕 Save date
-                    threat_type=risk.threat_type,
-                    recommended_action=risk.recommended_action
-                )
-                db.add(db_risk)
-            
-            db.commit()
-            print(f"✅ Patrol sweep saved. Identified {len(result['risks'])} risks.")
-            
-        except Exception as db_e:
-            db.rollback()
-            print(f"⚠️ Database Error: {db_e}")
-            raise db_e
-        finally:
-            db.close()
-
-        return PatrolResponse(summary=result["summary"], risks=result["risks"])
+        with trace_sweep() as trace:
+            # 1. Run the sweep engine directly (the agent tool wraps the same function)
+            source_index = SeenSourceIndex() if incremental else None
+            result = await run_sweep(extra_zone, source_index=source_index, on_event=on_event, zones=zones)
+            print(f"🛰️ Sweep finished in {time.perf_counter() - started:.1f} s")
+
+            carry_over = None
+            if zones is not None:
+                # Active zones only (what plan_due_zones schedules): deactivated zones' risks stop carrying over
+                carry_over = [name for name in await active_zone_names() if name not in result["zones"]]
+
+            # 2. Database Operation (async engine, single transaction)
+            try:
+                report_id, timestamp, summary, active_risks = await save_report(result, source_index, trace, carry_over)
+            except Exception as db_e:
+                print(f"⚠️ Database Error: {db_e}")
+                raise db_e
+
+            # Restarts each scanned zone's interval (failed zones too: they wait their turn)
+            try:
+                await mark_scanned(result["zones"], timestamp)
+            except Exception as e:
+                print(f"⚠️ Could not update zone schedule: {e}")
+
+        SWEEPS.labels("succeeded").inc()
+        SWEEP_SECONDS.labels("succeeded").observe(time.perf_counter() - started)
+        for risk in result["risks"]:
+            known = source_index is not None and source_index.is_known(risk)
+            SWEEP_RISKS.labels(zone_label(risk.zone), "known" if known else "new").inc()
+
+        print(f"✅ Patrol sweep saved. {summary}")
+        await emit(on_event, "summary", {"report_id": report_id, "summary": summary, "risks": len(active_risks)})
+        return PatrolResponse(summary=summary, risks=active_risks, report_id=report_id, timestamp=timestamp)
 
     except Exception as e:
+        SWEEPS.labels("failed").inc()
+        SWEEP_SECONDS.labels("failed").observe(time.perf_counter() - started)
         print(f"❌ Patrol Task Failed: {e}")
         traceback.print_exc()
-        raise e
\ No newline at end of file
+        raise e
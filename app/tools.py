@@ -1,166 +1,299 @@
 import os
-from typing import List, Optional
-import httpx
-from langchain_core.tools import tool
-from tavily import TavilyClient
-
-from tavily import AsyncTavilyClient
-from openai import OpenAI
-from openai import AsyncOpenAI
-from geopy.geocoders import Nominatim
-from app.schemas import CRITICAL_ZONES, ZONE_DEFAULTS, ZoneAnalysisResult, InfrastructureRisk
+import uuid
+import asyncio
+from typing import Awaitable, Callable, List, Optional
+from app.alerts import ALERT_MIN_SCORE, alert_dispatcher
+from app.analysis_cache import analysis_key, get_cached_analysis, store_analysis
+from app.context import build_zone_context, format_sources, load_encoder
+from app.geocoding import resolve_coordinates
+from app.http_client import get_http_client
+from app.metrics import observe_stage, record_tokens
+from app.incremental import SeenSourceIndex
+from app.relevance import RelevanceFilter
+from app.schemas import ZoneAnalysisResult, InfrastructureRisk
+from app.zones import active_zone_names
 
 # Initialize Clients
-# tavily_client = TavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-tavily_client = AsyncTavilyClient(api_key=os.getenv("TAVILY_API_KEY"))
-# openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-geolocator = Nominatim(user_agent="cnii_sentinel_patrol")
-
-def resolve_coordinates(specific_location: str, parent_zone: str):
-    """Helper to geocode locations with fallback."""
-    try:
-        query = f"{specific_location}, Nigeria"
-        location = geolocator.geocode(query, timeout=5)
-        if location:
-            return location.latitude, location.longitude
-    except Exception:
-        pass
-    return ZONE_DEFAULTS.get(parent_zone, (9.0820, 8.6753))
+# Base URLs are overridable so the benchmark harness can point at local stubs
+# (OpenAI reads OPENAI_BASE_URL itself).
+TAVILY_BASE_URL = os.getenv("TAVILY_BASE_URL", "https://api.tavily.com")
+JINA_READER_BASE = os.getenv("JINA_READER_BASE", "https://r.jina.ai").rstrip("/")
+
+# Built on first use: importing the SDKs costs more than the rest of the
+# module, and the API process should not pay for it before serving requests.
+_tavily_client = None
+_openai_client = None
+
+def get_tavily_client():
+    global _tavily_client
+    if _tavily_client is None:
+        from tavily import AsyncTavilyClient
+        _tavily_client = AsyncTavilyClient(api_key=os.getenv("TAVILY_API_KEY"), base_url=TAVILY_BASE_URL)
+    return _tavily_client
+
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        from openai import AsyncOpenAI
+        _openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    return _openai_client
+
+# --- Concurrency Limits ---
+# Zones run in parallel, so each provider gets its own cap to stay inside
+# its rate limits. Override per deployment with the env vars below.
+# (Nominatim is throttled separately by the rate-limited queue in app.geocoding.)
+PROVIDER_LIMITS = {
+    "tavily": int(os.getenv("TAVILY_CONCURRENCY", "4")),
+    "jina": int(os.getenv("JINA_CONCURRENCY", "6")),
+    "openai": int(os.getenv("OPENAI_CONCURRENCY", "4")),
+}
+provider_slots = {name: asyncio.Semaphore(max(1, limit)) for name, limit in PROVIDER_LIMITS.items()}
+
+async def geocode_risk(risk: InfrastructureRisk, parent_zone: str) -> InfrastructureRisk:
+    """Attaches coordinates (cached, rate-limited, off the event loop)."""
+    risk.latitude, risk.longitude = await resolve_coordinates(risk.location_identified, parent_zone)
+    return risk
+
+ANALYSIS_MODEL = os.getenv("ANALYSIS_MODEL", "gpt-4o-mini")
+# Bump PROMPT_VERSION whenever ANALYST_PROMPT changes so cached analyses are not reused
+PROMPT_VERSION = "analyst-v1"
+ANALYST_PROMPT = (
+    "### ROLE\n"
+    "You are a Senior Nigerian Infrastructure Security Analyst specializing in "
+    "Critical National Information Infrastructure (CNII).\n\n"
+
+    "### MISSION\n"
+    "Identify road construction, dredging, or excavation projects in NIGERIA "
+    "that pose a physical threat to fiber optic backbone cables.\n\n"
+
+    "STRICT RULE: For every risk identified, you MUST provide the 'URL' of the "
+    "source where you found that specific information. Do not guess; use the "
+    "provided URL labels in the context."
+
+    "### STRICT GEOGRAPHIC RULES\n"
+    "1. ONLY process data related to Nigeria (Lagos, Abuja, PH, etc.).\n"
+    "2. IMMEDIATELY DISCARD any results from the UK, USA, or other countries.\n"
+    "3. If you see 'Melton Mowbray' or 'Leicestershire', ignore it. It is out of scope.\n"
+    "4. If no Nigerian risks are found in the text, return an empty list: [].\n\n"
+
+    "### ANALYSIS CRITERIA\n"
+    "Look for: 'road expansion', 'drainage works', 'bridge construction', or 'digging' "
+    "in proximity to known telecommunications routes."
+)
 
 async def analyze_with_llm(zone_name: str, search_context: str) -> List[InfrastructureRisk]:
-    """Helper to analyze text with OpenAI asynchronously."""
+    """Helper to analyze text with OpenAI asynchronously. Raises on API errors."""
+    # We use 'await' here so the server stays responsive during the AI's "thought process"
+    async with provider_slots["openai"]:
+        with observe_stage("analyze", zone_name):
+            completion = await get_openai_client().beta.chat.completions.parse(
+                model=ANALYSIS_MODEL,
+                messages=[
+                    {"role": "system", "content": ANALYST_PROMPT},
+                    {"role": "user", "content": f"Zone: {zone_name}\n\nSearch Data:\n{search_context}"}
+                ],
+                response_format=ZoneAnalysisResult,
+            )
+    record_tokens(zone_name, completion.usage)
+    return completion.choices[0].message.parsed.risks
+
+async def analyze_sources(zone_name: str, sources: List[dict]) -> Optional[List[InfrastructureRisk]]:
+    """
+    Cache-first analysis: identical sources are never sent to OpenAI twice within the TTL.
+    Returns None when the completion failed.
+    """
+    key = analysis_key(zone_name, sources, PROMPT_VERSION, ANALYSIS_MODEL)
+    cached = get_cached_analysis(key)
+    if cached is not None:
+        print(f"♻️ Analysis cache hit for {zone_name}")
+        return cached
+
     try:
-        # We use 'await' here so the server stays responsive during the AI's "thought process"
-        completion = await openai_client.beta.chat.completions.parse(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system", 
-                   "content": (
-                        "### ROLE\n"
-                        "You are a Senior Nigerian Infrastructure Security Analyst specializing in "
-                        "Critical National Information Infrastructure (CNII).\n\n"
-                        
-                        "### MISSION\n"
-                        "Identify road construction, dredging, or excavation projects in NIGERIA "
-                        "that pose a physical threat to fiber optic backbone cables.\n\n"
-                        
-                        "STRICT RULE: For every risk identified, you MUST provide the 'URL' of the "
-                        "source where you found that specific information. Do not guess; use the "
-                        "provided URL labels in the context."
-
-                        "### STRICT GEOGRAPHIC RULES\n"
-                        "1. ONLY process data related to Nigeria (Lagos, Abuja, PH, etc.).\n"
-                        "2. IMMEDIATELY DISCARD any results from the UK, USA, or other countries.\n"
-                        "3. If you see 'Melton Mowbray' or 'Leicestershire', ignore it. It is out of scope.\n"
-                        "4. If no Nigerian risks are found in the text, return an empty list: [].\n\n"
-                        
-                        "### ANALYSIS CRITERIA\n"
-                        "Look for: 'road expansion', 'drainage works', 'bridge construction', or 'digging' "
-                        "in proximity to known telecommunications routes."
-                    )
-                },
-                {"role": "user", "content": f"Zone: {zone_name}\n\nSearch Data:\n{search_context}"}
-            ],
-            response_format=ZoneAnalysisResult,
-        )
-        return completion.choices[0].message.parsed.risks
+        risks = await analyze_with_llm(zone_name, format_sources(sources))
     except Exception as e:
+        # Failures are not cached (and return None) so the next sweep retries
         print(f"⚠️ OpenAI Async Error in {zone_name}: {e}")
-        return []
-    
-TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-CHAT_ID = os.getenv("CHAT_ID")
-
-
-async def send_telegram_alert(risk_level, location, summary):
-    # Filter is already handled by the caller (risk_score >= 7)
-    message = (
-        f"🚨 *SENTINEL HIGH-PRIORITY ALERT*\n\n"
-        f"📍 *Location:* {location}\n"
-        f"⚠️ *Risk:* {risk_level}\n"
-        f"📝 *Summary:* {summary}\n\n"
-        f"🔗 [Open Dashboard](https://ai-sentinel-eye.web.app)"
-    )
+        return None
+
+    store_analysis(key, risks)
+    return risks
+
+def merge_risks(batches: List[List[InfrastructureRisk]]) -> List[InfrastructureRisk]:
+    """Merges per-source results, keeping the highest-scored copy of a repeated risk."""
+    merged = {}
+    for risks in batches:
+        for risk in risks:
+            key = (risk.source_url, risk.location_identified.strip().lower(), risk.threat_type.strip().lower())
+            if key not in merged or risk.risk_score > merged[key].risk_score:
+                merged[key] = risk
+    return list(merged.values())
     
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, data={
-            "chat_id": CHAT_ID,
-            "text": message,
-            "parse_mode": "Markdown"
-        })
-        
-        # ADD THIS: Check if Telegram actually accepted the message
-        if response.status_code != 200:
-            print(f"❌ Telegram Error: {response.status_code} - {response.text}")
-        else:
-            print(f"✅ Telegram Alert Sent to {CHAT_ID}")
-
-
-async def fetch_clean_content(url: str) -> str:
+JINA_TIMEOUT = float(os.getenv("JINA_TIMEOUT", "10"))
+
+async def fetch_clean_content(url: str, zone: Optional[str] = None) -> str:
     """The 'Sniper': Fetches clean, LLM-ready text using Jina Reader."""
     try:
-        async with httpx.AsyncClient() as client:
-            # Prepending r.jina.ai/ extracts the main content and strips sidebars
-            response = await client.get(f"https://r.jina.ai/{url}", timeout=10)
-            return response.text if response.status_code == 200 else ""
+        async with provider_slots["jina"]:
+            with observe_stage("fetch", zone) as stage:
+                # Prepending r.jina.ai/ extracts the main content and strips sidebars
+                response = await get_http_client().get(f"{JINA_READER_BASE}/{url}", timeout=JINA_TIMEOUT)
+                if response.status_code != 200:
+                    stage.fail()
+                    return ""
+                return response.text
     except Exception:
+        # Caller falls back to Tavily's snippet for this URL only
         return ""
 
-@tool
-async def perform_patrol_sweep(extra_zone: Optional[str] = None) -> dict:
+# Progress hook for live streaming: called as on_event(event_name, payload)
+EventCallback = Callable[[str, dict], Awaitable[None]]
+
+async def emit(on_event: Optional[EventCallback], event: str, data: dict) -> None:
+    """Sends a progress event; a broken listener never breaks the sweep."""
+    if on_event is None:
+        return
+    try:
+        await on_event(event, data)
+    except Exception as e:
+        print(f"⚠️ Progress listener error ({event}): {e}")
+
+async def search_zone(zone: str) -> List[dict]:
+    """STEP 1: The 'Scout' (Tavily find URLs)."""
+    try:
+        async with provider_slots["tavily"]:
+            with observe_stage("search", zone):
+                search = await get_tavily_client().search(
+                    query=f'"{zone}" Nigeria road construction fiber optic damage', 
+                    topic="news", max_results=3, search_depth="advanced"
+                )
+        return search.get('results', [])
+    except Exception as e:
+        print(f"❌ Error searching {zone}: {e}")
+        return []
+
+async def scan_zone(
+    zone: str,
+    results: List[dict],
+    is_known: Optional[Callable[[InfrastructureRisk], bool]] = None,
+    on_event: Optional[EventCallback] = None,
+    alert_batch: Optional[str] = None,
+) -> dict:
     """
-    Scans critical infrastructure zones using Tavily search and cleans article content 
-    with Jina Reader to identify fiber optic risks in Nigeria.
+    Runs the Sniper -> Analyst -> Geocode pipeline on a zone's pre-filtered search results.
+    Returns {"zone", "risks", "tokens", "complete"}: tokens is the context size sent to the
+    LLM, complete is False when any stage failed. Risks matching is_known are not alerted;
+    the rest are queued on the alert dispatcher (grouped into alert_batch's digest).
+    Each risk is emitted as a "risk" event as soon as it is geocoded.
     """
-    all_risks = []
-    targets = CRITICAL_ZONES.copy()
-    if extra_zone and extra_zone.lower() != "string":
+    scan = {"zone": zone, "risks": [], "tokens": 0, "complete": True}
+    if not results:
+        return scan
+    try:
+        # STEP 2: The 'Sniper' (Fetch full clean text for every source at once)
+        clean_texts = await asyncio.gather(*(fetch_clean_content(r['url'], zone) for r in results))
+
+        sources = [
+            {
+                "url": r['url'],
+                "title": r.get('title'),
+                "published_date": r.get('published_date'),
+                "content": clean_text if len(clean_text) > 200 else r['content'],
+            }
+            for r, clean_text in zip(results, clean_texts)
+        ]
+
+        # STEP 3: The 'Analyst' on a token-budgeted context
+        # (one call when the zone fits the budget, otherwise one call per source)
+        context = build_zone_context(zone, sources)
+        scan["tokens"] = context.tokens
+        print(f"🧮 {zone}: {context.tokens} context tokens ({context.mode}, {len(context.batches)} call(s))")
+        batch_risks = await asyncio.gather(*(analyze_sources(zone, batch) for batch in context.batches))
+        if any(risks is None for risks in batch_risks):
+            scan["complete"] = False
+            batch_risks = [risks or [] for risks in batch_risks]
+        zone_risks = batch_risks[0] if len(batch_risks) == 1 else merge_risks(batch_risks)
+        for risk in zone_risks:
+            risk.zone = zone
+
+        # STEP 4: Geocode all risks in parallel (gather keeps the LLM's order)
+        async def locate(risk: InfrastructureRisk) -> InfrastructureRisk:
+            await geocode_risk(risk, zone)
+            await emit(on_event, "risk", {"zone": zone, "risk": risk.model_dump(mode="json")})
+            return risk
+
+        zone_risks = await asyncio.gather(*(locate(risk) for risk in zone_risks))
+
+        # Queued, not sent: Telegram round-trips stay off the sweep's critical path
+        for risk in zone_risks:
+            if risk.risk_score >= ALERT_MIN_SCORE and not (is_known and is_known(risk)):
+                alert_dispatcher.enqueue(risk, batch=alert_batch)
+        scan["risks"] = list(zone_risks)
+    except Exception as e:
+        print(f"❌ Error scanning {zone}: {e}")
+        scan["complete"] = False
+    return scan
+
+async def run_sweep(
+    extra_zone: Optional[str] = None,
+    source_index: Optional[SeenSourceIndex] = None,
+    on_event: Optional[EventCallback] = None,
+    zones: Optional[List[str]] = None,
+) -> dict:
+    """
+    The sweep engine behind perform_patrol_sweep and run_patrol_and_save.
+    Scans the given zones (default: every active zone in the registry) plus extra_zone.
+    With a source_index (incremental mode) only new/changed sources are processed.
+    on_event receives zone_started / sources_found / risk / zone_complete events.
+    """
+    targets = list(zones) if zones is not None else await active_zone_names()
+    if extra_zone and extra_zone.lower() != "string" and extra_zone not in targets:
         targets.append(extra_zone)
+    # No-op once loaded (the API warm-up does it); otherwise keeps the first load off the loop
+    await asyncio.to_thread(load_encoder)
 
-    for zone in targets:
-        try:
-            # STEP 1: The 'Scout' (Tavily find URLs)
-            search = await tavily_client.search(
-                query=f'"{zone}" Nigeria road construction fiber optic damage', 
-                topic="news", max_results=3, search_depth="advanced"
-            )
-            
-            results = search.get('results', [])
-            search_context = ""
-            
-            for i, r in enumerate(results):
-                # STEP 2: The 'Sniper' (Fetch full clean text)
-                clean_text = await fetch_clean_content(r['url'])
-                content_to_use = clean_text if len(clean_text) > 200 else r['content']
-                
-                # STEP 3: Labeled Context for the AI
-                search_context += (
-                    f"--- SOURCE [{i}] ---\n"
-                    f"TITLE: {r.get('title')}\n"
-                    f"DATE: {r.get('published_date')}\n"
-                    f"URL: {r['url']}\n"
-                    f"CONTENT: {content_to_use}\n\n"
-                )
+    async def scout(zone: str) -> List[dict]:
+        await emit(on_event, "zone_started", {"zone": zone})
+        return await search_zone(zone)
+
+    # All zones run concurrently; provider_slots keep each API within its limit.
+    # gather() returns results in target order, so the report stays deterministic.
+    searches = await asyncio.gather(*(scout(zone) for zone in targets))
+
+    # Local pre-filter: drop duplicates and out-of-scope articles before any fetch/LLM spend.
+    # Dedup is per zone: an article covering two corridors is analyzed (and yields risks) for each.
+    relevance = RelevanceFilter(targets)
+    filtered = [relevance.filter(zone, results) for zone, results in zip(targets, searches)]
+    print(f"🧹 Pre-filter: {relevance.counters}")
+    stats = {"prefilter": relevance.counters}
+
+    is_known = None
+    if source_index is not None:
+        await source_index.load([r for results in filtered for r in results])
+        filtered = [source_index.select(zone, results) for zone, results in zip(targets, filtered)]
+        is_known = source_index.is_known
+        stats["incremental"] = source_index.counters
+        print(f"🔁 Incremental: {source_index.counters}")
+
+    async def patrol(zone: str, found: List[dict], results: List[dict]) -> dict:
+        await emit(on_event, "sources_found", {"zone": zone, "found": len(found), "processing": len(results)})
+        scan = await scan_zone(zone, results, is_known, on_event, alert_batch)
+        await emit(on_event, "zone_complete", {"zone": zone, "risks": len(scan["risks"]), "complete": scan["complete"]})
+        return scan
+
+    # This sweep's alerts go out as one digest once every zone is done
+    alert_batch = uuid.uuid4().hex
+    try:
+        scans = await asyncio.gather(*(
+            patrol(zone, found, results) for zone, found, results in zip(targets, searches, filtered)
+        ))
+    finally:
+        alert_dispatcher.close_batch(alert_batch)
+    if source_index is not None:
+        for scan in scans:
+            if not scan["complete"]:
+                source_index.discard(scan["zone"])
 
-            if search_context:
-                zone_risks = await analyze_with_llm(zone, search_context)
-                for risk in zone_risks:
-                    lat, lng = resolve_coordinates(risk.location_identified, zone)
-                    risk.latitude, risk.longitude = lat, lng
-                    all_risks.append(risk)
-                    
-                    if risk.risk_score >= 7:
-                        await send_telegram_alert(
-                            risk_level=f"{risk.risk_score}/10",
-                            location=risk.location_identified,
-                            summary=risk.summary
-                        )
-        except Exception as e:
-            print(f"❌ Error scanning {zone}: {e}")
+    all_risks = [risk for scan in scans for risk in scan["risks"]]
+    stats["tokens_by_zone"] = {scan["zone"]: scan["tokens"] for scan in scans}
     
-    return {"summary": f"Sweep complete. Identified {len(all_risks)} risks.", "risks": all_risks}
-# Export tools list for the agent
-all_tools = [perform_patrol_sweep]
\ No newline at end of file
+    return {"summary": f"Sweep complete. Identified {len(all_risks)} risks.", "risks": all_risks, "stats": stats, "zones": targets}
@@ -0,0 +1,98 @@
+"""
+Sweep worker: runs patrol sweeps outside the web tier.
+
+    SWEEP_EXECUTION=worker python -m app.worker
+
+Claims queued rows from patrol_runs, runs each through the sweep coordinator
+and records its status, timings and resulting report. The patrol schedule
+lives here too, so API replicas and sweep workers scale independently.
+"""
+import asyncio
+import os
+import signal
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from prometheus_client import start_http_server
+from dotenv import load_dotenv
+
+from app.alerts import alert_dispatcher
+from app.database import init_db
+from app.http_client import close_http_client, start_http_client
+from app.jobs import WORKER_ID, claim_next_run, enqueue_run, execute_run, requeue_stale_runs
+from app.retention import scheduled_retention
+from app.scheduling import add_maintenance_schedule, add_sweep_schedule
+from app.zones import plan_due_zones
+
+load_dotenv()
+
+# How long an idle worker sleeps before checking the queue again
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", "5"))
+# Port for this worker's own Prometheus endpoint (sweep metrics live here in worker mode)
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+
+async def scheduled_sweep() -> None:
+    await enqueue_run("scheduler")
+
+
+async def scheduled_zone_sweep() -> None:
+    due = await plan_due_zones()
+    if due:
+        await enqueue_run("scheduler", zones=due)
+
+
+async def work(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            await requeue_stale_runs()
+            run = await claim_next_run(WORKER_ID)
+        except Exception as e:
+            print(f"⚠️ Queue unavailable: {e}")
+            run = None
+
+        if run is None:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=WORKER_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        print(f"👷 Worker {WORKER_ID} picked up patrol run {run.id} (trigger: {run.trigger})")
+        try:
+            await execute_run(run)
+        except Exception:
+            pass  # recorded on the run row; keep serving the queue
+
+
+async def main() -> None:
+    print(f"👷 Sentinel sweep worker {WORKER_ID} starting...")
+    init_db()
+    await start_http_client()
+    if WORKER_METRICS_PORT:
+        start_http_server(WORKER_METRICS_PORT)
+        print(f"📈 Worker metrics on :{WORKER_METRICS_PORT}/metrics")
+    scheduler = AsyncIOScheduler()
+    add_sweep_schedule(scheduler, scheduled_sweep, scheduled_zone_sweep)
+    add_maintenance_schedule(scheduler, scheduled_retention)
+    scheduler.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    try:
+        # A run in progress finishes before the worker exits
+        await work(stop)
+    finally:
+        print("🛑 Sweep worker shutting down...")
+        scheduler.shutdown()
+        await alert_dispatcher.stop()  # flush queued alerts first
+        await close_http_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,184 @@
+import datetime
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+
+from app.database import AsyncSessionLocal, RiskRecord, SeenSource, SessionLocal, Zone
+from app.schemas import CRITICAL_ZONES, ZONE_DEFAULTS
+
+# --- Adaptive Scheduling ---
+# Each zone's scan interval slides (geometrically) between these bounds with its heat
+ZONE_MIN_INTERVAL_MINUTES = float(os.getenv("ZONE_MIN_INTERVAL_MINUTES", "60"))
+ZONE_MAX_INTERVAL_MINUTES = float(os.getenv("ZONE_MAX_INTERVAL_MINUTES", str(24 * 60)))
+# Heat is computed from risks and new sources seen over this window
+ZONE_LOOKBACK_DAYS = float(os.getenv("ZONE_LOOKBACK_DAYS", "14"))
+# New sources per day at which a zone counts as fully active
+ZONE_HOT_SOURCES_PER_DAY = float(os.getenv("ZONE_HOT_SOURCES_PER_DAY", "1"))
+# Provider calls one zone scan costs: 1 Tavily + ~3 Jina + 1-2 OpenAI (geocoding is mostly cached)
+ZONE_SCAN_COST = int(os.getenv("ZONE_SCAN_COST", "6"))
+# Hard ceiling on provider calls per hour across all scheduled scans
+API_CALL_BUDGET_PER_HOUR = int(os.getenv("API_CALL_BUDGET_PER_HOUR", "120"))
+
+Coordinates = Tuple[float, float]
+
+# Names and fallback coordinates of every registered zone, refreshed whenever
+# the registry is read. Starts from the built-in list so lookups work before
+# the database is reachable.
+_registry: Dict[str, Optional[Coordinates]] = dict(ZONE_DEFAULTS)
+
+
+def _utcnow() -> datetime.datetime:
+    return datetime.datetime.utcnow()
+
+
+def _remember(zones: List[Zone]) -> None:
+    for zone in zones:
+        coords = (zone.latitude, zone.longitude) if zone.latitude is not None and zone.longitude is not None else None
+        _registry[zone.name] = coords or ZONE_DEFAULTS.get(zone.name)
+
+
+def zone_coordinates(name: str) -> Optional[Coordinates]:
+    return _registry.get(name)
+
+
+def known_zone_names() -> List[str]:
+    return list(_registry)
+
+
+def is_known_zone(name: str) -> bool:
+    return name in _registry
+
+
+def seed_zones() -> None:
+    """Adds any built-in zone missing from the registry (existing rows are left alone)."""
+    with SessionLocal() as db:
+        existing = set(db.scalars(select(Zone.name)))
+        missing = [name for name in CRITICAL_ZONES if name not in existing]
+        for name in missing:
+            lat, lng = ZONE_DEFAULTS.get(name, (None, None))
+            db.add(Zone(name=name, latitude=lat, longitude=lng, active=True))
+        db.commit()
+        _remember(list(db.scalars(select(Zone))))
+    if missing:
+        print(f"🗺️ Zone registry seeded with {len(missing)} zone(s).")
+
+
+async def load_zones(active_only: bool = True) -> List[Zone]:
+    stmt = select(Zone).order_by(Zone.id)
+    if active_only:
+        stmt = stmt.where(Zone.active.is_(True))
+    async with AsyncSessionLocal() as session:
+        zones = list((await session.scalars(stmt)).all())
+    _remember(zones)
+    return zones
+
+
+async def active_zone_names() -> List[str]:
+    """Zones a full sweep covers (the built-in list if the registry is empty or unreachable)."""
+    try:
+        names = [zone.name for zone in await load_zones()]
+    except Exception as e:
+        print(f"⚠️ Zone registry unavailable ({e}); using built-in zones.")
+        return list(CRITICAL_ZONES)
+    return names or list(CRITICAL_ZONES)
+
+
+async def upsert_zone(name: str, latitude: Optional[float], longitude: Optional[float], active: bool = True) -> Zone:
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            zone = await session.scalar(select(Zone).where(Zone.name == name))
+            if zone is None:
+                zone = Zone(name=name, created_at=_utcnow())
+                session.add(zone)
+            if latitude is not None and longitude is not None:
+                zone.latitude, zone.longitude = latitude, longitude
+            zone.active = active
+    _remember([zone])
+    return zone
+
+
+async def mark_scanned(names: List[str], when: datetime.datetime) -> None:
+    if not names:
+        return
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(update(Zone).where(Zone.name.in_(names)).values(last_scanned_at=when))
+
+
+def zone_heat(max_score: Optional[int], new_sources: int, days: float) -> float:
+    """0..1: mostly the worst recent risk score, partly how fast new sources appear."""
+    score_heat = min(1.0, (max_score or 0) / 10)
+    source_heat = min(1.0, new_sources / max(days * ZONE_HOT_SOURCES_PER_DAY, 1e-9))
+    return round(0.7 * score_heat + 0.3 * source_heat, 3)
+
+
+def interval_for(heat: float) -> float:
+    """Hot zones get the minimum interval, quiet ones the maximum (geometric in between)."""
+    ratio = ZONE_MIN_INTERVAL_MINUTES / ZONE_MAX_INTERVAL_MINUTES
+    return ZONE_MAX_INTERVAL_MINUTES * math.pow(ratio, max(0.0, min(1.0, heat)))
+
+
+async def _zone_activity(session, since: datetime.datetime) -> Tuple[Dict[str, int], Dict[str, int]]:
+    scores = await session.execute(
+        select(RiskRecord.zone, func.max(RiskRecord.risk_score))
+        .where(RiskRecord.timestamp >= since)
+        .group_by(RiskRecord.zone)
+    )
+    sources = await session.execute(
+        select(SeenSource.zone, func.count(SeenSource.id))
+        .where(SeenSource.first_seen >= since)
+        .group_by(SeenSource.zone)
+    )
+    return dict(scores.all()), dict(sources.all())
+
+
+async def plan_due_zones(now: Optional[datetime.datetime] = None) -> List[str]:
+    """
+    Recomputes every active zone's heat and interval, stretches all intervals
+    if together they would exceed API_CALL_BUDGET_PER_HOUR, and returns the
+    zones due for a scan (hottest first) that fit in what is left of this
+    hour's budget.
+    """
+    now = now or _utcnow()
+    since = now - datetime.timedelta(days=ZONE_LOOKBACK_DAYS)
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            zones = list((await session.scalars(select(Zone).where(Zone.active.is_(True)))).all())
+            if not zones:
+                return []
+            max_scores, new_sources = await _zone_activity(session, since)
+
+            for zone in zones:
+                zone.heat = zone_heat(max_scores.get(zone.name), new_sources.get(zone.name, 0), ZONE_LOOKBACK_DAYS)
+                zone.scan_interval_minutes = interval_for(zone.heat)
+
+            # Steady-state calls/hour of this plan; stretch every interval to fit the budget
+            planned = sum(ZONE_SCAN_COST * 60 / zone.scan_interval_minutes for zone in zones)
+            stretch = max(1.0, planned / max(API_CALL_BUDGET_PER_HOUR, 1))
+            for zone in zones:
+                zone.scan_interval_minutes = round(zone.scan_interval_minutes * stretch, 1)
+                zone.next_scan_at = (
+                    zone.last_scanned_at + datetime.timedelta(minutes=zone.scan_interval_minutes)
+                    if zone.last_scanned_at else now
+                )
+
+            hour_ago = now - datetime.timedelta(hours=1)
+            spent = ZONE_SCAN_COST * sum(1 for zone in zones if zone.last_scanned_at and zone.last_scanned_at >= hour_ago)
+            remaining = API_CALL_BUDGET_PER_HOUR - spent
+
+            due = sorted((zone for zone in zones if zone.next_scan_at <= now), key=lambda z: -z.heat)
+            picked = []
+            for zone in due:
+                if remaining < ZONE_SCAN_COST:
+                    break
+                picked.append(zone.name)
+                remaining -= ZONE_SCAN_COST
+    _remember(zones)
+
+    if picked:
+        print(f"🗓️ Adaptive schedule: {len(picked)}/{len(zones)} zone(s) due ({', '.join(picked)}); stretch x{stretch:.2f}")
+    elif due:
+        print(f"⏸️ Adaptive schedule: {len(due)} zone(s) due but this hour's API budget is spent.")
+    return picked
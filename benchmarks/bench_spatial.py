@@ -0,0 +1,130 @@
+"""
+Spatial query benchmark on a synthetic risk_records table.
+
+Builds (once) a SQLite database with N random risks spread over Nigeria and a
+year of timestamps, then compares the grid-cell indexed /risks/nearby and
+/risks/bbox queries against a plain lat/lng range scan.
+
+    python -m benchmarks.bench_spatial            # 1,000,000 rows
+    python -m benchmarks.bench_spatial --rows 200000 --rebuild
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import sys
+import time
+
+DEFAULT_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bench_spatial.sqlite3")
+
+# Nigeria's bounding box
+LAT_RANGE = (4.2, 13.9)
+LNG_RANGE = (2.7, 14.7)
+# (lat, lng) probes: Lagos-Ibadan, Lekki-Epe, Abuja-Kaduna, Kano-Zaria
+PROBES = [(6.9530, 3.6157), (6.4716, 3.7297), (9.6844, 7.8288), (11.5363, 8.0827)]
+
+
+def _configure(db_path: str) -> None:
+    # Must run before any app module is imported: the engines are built at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+
+
+def build(rows: int, batch: int = 50_000) -> None:
+    from sqlalchemy import insert
+    from app.database import Base, PatrolReport, RiskRecord, engine
+    from app.geo import geo_cell
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(42)
+    now = datetime.datetime.utcnow()
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        report_id = conn.execute(insert(PatrolReport).values(summary="synthetic", timestamp=now)).inserted_primary_key[0]
+        for offset in range(0, rows, batch):
+            chunk = []
+            for _ in range(min(batch, rows - offset)):
+                lat, lng = rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE)
+                chunk.append({
+                    "report_id": report_id,
+                    "last_report_id": report_id,
+                    "risk_level": rng.choice(("Low", "Medium", "High")),
+                    "risk_score": rng.randint(0, 10),
+                    "location": "synthetic",
+                    "threat_type": rng.choice(("Excavation", "Road Grading", "Drainage Works")),
+                    "latitude": lat,
+                    "longitude": lng,
+                    "geo_cell": geo_cell(lat, lng),
+                    "timestamp": now - datetime.timedelta(minutes=rng.randint(0, 365 * 24 * 60)),
+                })
+            conn.execute(insert(RiskRecord), chunk)
+            print(f"  inserted {offset + len(chunk):,}/{rows:,}", end="\r", flush=True)
+    print(f"\n🏗️ Built {rows:,} rows in {time.perf_counter() - started:.1f} s")
+
+
+async def _time(label: str, fn, repeat: int) -> None:
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"  {label:<42} median {statistics.median(timings):8.2f} ms   p95 {sorted(timings)[int(0.95 * (len(timings) - 1))]:8.2f} ms   ({result} rows)")
+
+
+async def run(repeat: int) -> None:
+    from sqlalchemy import func, select
+    from app.database import AsyncSessionLocal, RiskRecord
+    from app.geo import bbox_for_radius, haversine_km
+    from app.queries import fetch_risks_in_bbox, fetch_risks_nearby
+
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=30)
+
+    for lat, lng in PROBES:
+        print(f"📍 Probe ({lat}, {lng}) — 5 km / 30 days")
+
+        async def indexed_nearby():
+            return len((await fetch_risks_nearby(lat, lng, 5, 1000, since=since)).items)
+
+        async def full_scan_nearby():
+            # Baseline: no grid cells, so the database scans on lat/lng alone
+            min_lat, min_lng, max_lat, max_lng = bbox_for_radius(lat, lng, 5)
+            stmt = select(RiskRecord.latitude, RiskRecord.longitude).where(
+                func.coalesce(RiskRecord.latitude, 0).between(min_lat, max_lat),
+                func.coalesce(RiskRecord.longitude, 0).between(min_lng, max_lng),
+                RiskRecord.timestamp >= since,
+            )
+            async with AsyncSessionLocal() as session:
+                rows = (await session.execute(stmt)).all()
+            return sum(1 for r in rows if haversine_km(lat, lng, r.latitude, r.longitude) <= 5)
+
+        async def indexed_bbox():
+            bbox = (lat - 0.25, lng - 0.25, lat + 0.25, lng + 0.25)
+            return len((await fetch_risks_in_bbox(bbox, 1000, since=since)).items)
+
+        await _time("nearby (grid index + haversine)", indexed_nearby, repeat)
+        await _time("nearby (full scan baseline)", full_scan_nearby, repeat)
+        await _time("bbox 0.5° (grid index)", indexed_bbox, repeat)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--db", default=DEFAULT_DB)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args(argv)
+
+    fresh = args.rebuild or not os.path.exists(args.db)
+    _configure(args.db)
+    if fresh:
+        build(args.rows)
+    asyncio.run(run(args.repeat))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+End-to-end sweep benchmark against local provider stubs (no network, no API keys).
+
+Each run starts a fresh interpreter on an empty database and cache, runs the
+real sweep + persistence path, then load-tests /patrol/latest in-process, and
+reports:
+  sweep_s            sweep wall-clock (search -> save)
+  first_risk_s       time until the first risk event is emitted
+  latest_rps         /patrol/latest requests per second
+  peak_rss_mb        peak resident memory of the run
+
+Medians are compared against a saved baseline; a metric that is worse by more
+than --tolerance fails the run (exit code 1).
+
+    python -m benchmarks.bench_sweep                      # compare with baseline
+    python -m benchmarks.bench_sweep --save-baseline      # record a new baseline
+    python -m benchmarks.bench_sweep --latency openai=0.5 --errors jina=0.2
+    python -m benchmarks.bench_sweep --database-url mysql+pymysql://u:p@localhost/sentinel_bench
+
+With --database-url the tables in that database are DROPPED and recreated:
+point it at a scratch database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.stubs import StubServer, StubSettings, env_for, parse_pairs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_sweep.json")
+
+# metric -> True if higher is better
+METRICS = {"sweep_s": False, "first_risk_s": False, "latest_rps": True, "peak_rss_mb": False}
+
+
+async def _measure(latest_requests: int, concurrency: int) -> dict:
+    import httpx
+    from app.alerts import alert_dispatcher
+    from app.database import Base, engine
+    from app.http_client import close_http_client, start_http_client
+    from app.main import app
+    from app.tasks import run_patrol_and_save
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    await start_http_client()
+
+    started = time.perf_counter()
+    first_risk = {}
+
+    async def on_event(event: str, data: dict):
+        if event == "risk" and not first_risk:
+            first_risk["at"] = time.perf_counter() - started
+
+    result = await run_patrol_and_save(on_event=on_event)
+    sweep_s = time.perf_counter() - started
+    await alert_dispatcher.stop()
+
+    # /patrol/latest through the full ASGI stack (no sockets: measures the app, not the kernel)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        per_worker = max(1, latest_requests // concurrency)
+
+        async def poll():
+            for _ in range(per_worker):
+                response = await client.get("/patrol/latest")
+                assert response.status_code == 200, response.status_code
+
+        load_started = time.perf_counter()
+        await asyncio.gather(*(poll() for _ in range(concurrency)))
+        latest_rps = per_worker * concurrency / (time.perf_counter() - load_started)
+
+    await close_http_client()
+    return {
+        "sweep_s": round(sweep_s, 3),
+        "first_risk_s": round(first_risk.get("at", sweep_s), 3),
+        "latest_rps": round(latest_rps, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "risks": len(result.risks),
+    }
+
+
+def run_child(args) -> int:
+    """One measurement; the parent has already set up the environment."""
+    sample = asyncio.run(_measure(args.latest_requests, args.concurrency))
+    print("BENCH_RESULT " + json.dumps(sample))
+    return 0
+
+
+def run_once(args, stub_env: dict, workdir: str, index: int) -> dict:
+    run_dir = os.path.join(workdir, f"run{index}")
+    os.makedirs(run_dir)
+    env = dict(os.environ)
+    env.update(stub_env)
+    env.update({
+        "DATABASE_URL": args.database_url or f"sqlite:///{os.path.join(run_dir, 'bench.sqlite3')}",
+        "SENTINEL_CACHE_DIR": os.path.join(run_dir, "cache"),
+        "NOMINATIM_MIN_INTERVAL": str(args.nominatim_interval),
+        "TELEGRAM_MIN_INTERVAL": "0",
+        "STARTUP_MODE": "eager",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    env.pop("ASYNC_DATABASE_URL", None)
+    cmd = [
+        sys.executable, "-m", "benchmarks.bench_sweep", "--child",
+        "--latest-requests", str(args.latest_requests), "--concurrency", str(args.concurrency),
+    ]
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, capture_output=True, text=True)
+    line = next((l for l in proc.stdout.splitlines() if l.startswith("BENCH_RESULT ")), None)
+    if proc.returncode != 0 or line is None:
+        sys.stderr.write(proc.stdout[-4000:] + proc.stderr[-4000:])
+        raise SystemExit(f"Benchmark run {index} failed (exit {proc.returncode})")
+    return json.loads(line.split(" ", 1)[1])
+
+
+def compare(medians: dict, baseline: dict, tolerance: float) -> bool:
+    ok = True
+    print(f"\n  {'metric':<14}{'median':>12}{'baseline':>12}{'change':>10}")
+    for name, higher_is_better in METRICS.items():
+        value, base = medians[name], baseline.get(name)
+        if not base:
+            print(f"  {name:<14}{value:>12}{'-':>12}{'':>10}")
+            continue
+        change = (value - base) / base
+        worse = -change if higher_is_better else change
+        flag = "❌" if worse > tolerance else "✅"
+        ok &= worse <= tolerance
+        print(f"  {name:<14}{value:>12}{base:>12}{change:>+10.1%} {flag}")
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--database-url", help="Scratch database (default: a fresh SQLite file per run)")
+    parser.add_argument("--latency", help="Stub latency overrides, e.g. openai=0.5,jina=0.2")
+    parser.add_argument("--errors", help="Stub error rates, e.g. jina=0.1,openai=0.05")
+    parser.add_argument("--results-per-zone", type=int, default=3)
+    parser.add_argument("--nominatim-interval", type=float, default=0.0,
+                        help="Geocoder pacing (the real service needs 1.0)")
+    parser.add_argument("--latest-requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression (0.2 = 20%%)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        return run_child(args)
+
+    settings = StubSettings(results_per_zone=args.results_per_zone)
+    settings.latency.update(parse_pairs(args.latency))
+    settings.errors.update(parse_pairs(args.errors))
+
+    workdir = tempfile.mkdtemp(prefix="sentinel_bench_")
+    try:
+        with StubServer(settings) as stubs:
+            print(f"🧪 Stubs on {stubs.base_url}  latency={settings.latency}  errors={settings.errors or 'none'}")
+            samples = []
+            for i in range(args.runs):
+                sample = run_once(args, env_for(stubs.base_url), workdir, i)
+                print(f"  run {i + 1}: " + "  ".join(f"{k}={v}" for k, v in sample.items()))
+                samples.append(sample)
+            print(f"  provider calls: {settings.calls}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    medians = {name: round(statistics.median(s[name] for s in samples), 3) for name in METRICS}
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({**medians, "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                       "latency": settings.latency, "errors": settings.errors}, f, indent=2)
+        print(f"\n💾 Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline first.")
+        compare(medians, {}, args.tolerance)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    return 0 if compare(medians, baseline, args.tolerance) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
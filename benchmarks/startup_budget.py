@@ -0,0 +1,88 @@
+"""
+Cold-start budget check for the API process.
+
+Measures, each in a fresh interpreter:
+  * import time of app.main
+  * time from interpreter start until /health answers (lifespan included)
+  * time until /ready turns 200 (schema check done)
+and exits non-zero if the median exceeds its budget. CI enforces the same
+budgets through tests/test_startup_budget.py (python -m pytest).
+
+    python -m benchmarks.startup_budget
+    python -m benchmarks.startup_budget --runs 7 --import-budget 1.0
+
+Runs against a throwaway SQLite database unless --database-url is given.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_BUDGET = float(os.getenv("IMPORT_BUDGET_SECONDS", "1.5"))
+HEALTH_BUDGET = float(os.getenv("HEALTH_BUDGET_SECONDS", "2.0"))
+READY_BUDGET = float(os.getenv("READY_BUDGET_SECONDS", "5.0"))
+
+PROBE = r"""
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.main.app) as client:
+    assert client.get("/health").status_code == 200
+    healthy = time.perf_counter()
+    while client.get("/ready").status_code != 200:
+        if time.perf_counter() - started > 60:
+            raise SystemExit("never became ready")
+        time.sleep(0.01)
+    ready = time.perf_counter()
+print(json.dumps({"import": imported - started, "health": healthy - started, "ready": ready - started}))
+"""
+
+
+def measure(database_url: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": database_url,
+        "OPENAI_API_KEY": env.get("OPENAI_API_KEY", "budget-check"),
+        "TAVILY_API_KEY": env.get("TAVILY_API_KEY", "budget-check"),
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    env.pop("ASYNC_DATABASE_URL", None)
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET)
+    parser.add_argument("--health-budget", type=float, default=HEALTH_BUDGET)
+    parser.add_argument("--ready-budget", type=float, default=READY_BUDGET)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'startup.sqlite3')}"
+        samples = [measure(database_url) for _ in range(args.runs)]
+
+    budgets = {"import": args.import_budget, "health": args.health_budget, "ready": args.ready_budget}
+    failed = False
+    for name, budget in budgets.items():
+        median = statistics.median(s[name] for s in samples)
+        ok = median <= budget
+        failed |= not ok
+        print(f"  {'✅' if ok else '❌'} {name:<7} median {median:6.2f} s   budget {budget:5.2f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
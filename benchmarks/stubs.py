@@ -0,0 +1,238 @@
+"""
+Local stand-ins for every external provider the sweep calls: Tavily search,
+Jina Reader, an OpenAI-compatible chat completions endpoint (returns
+ZoneAnalysisResult JSON), Nominatim and Telegram. One HTTP server, one prefix
+per provider, each with configurable latency and error injection.
+
+    python -m benchmarks.stubs --port 8765 --latency openai=1.5,jina=0.2 --errors jina=0.1
+
+App settings pointing at a stub server on BASE (see env_for):
+    TAVILY_BASE_URL, JINA_READER_BASE, OPENAI_BASE_URL, NOMINATIM_DOMAIN,
+    NOMINATIM_SCHEME, TELEGRAM_API_BASE
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+PROVIDERS = ("tavily", "jina", "openai", "nominatim", "telegram")
+# Roughly what the real services take, in seconds
+DEFAULT_LATENCY = {"tavily": 0.8, "jina": 0.6, "openai": 2.0, "nominatim": 0.15, "telegram": 0.1}
+
+ARTICLE_PARAGRAPH = (
+    "Contractors working for the Federal Ministry of Works have begun excavation and "
+    "road expansion along {zone}. Residents report bulldozers digging trenches close to "
+    "telecom cable ducts, and operators warn that fiber optic links could be cut during "
+    "the drainage works and bridge construction scheduled for the coming weeks. "
+)
+FILLER_PARAGRAPH = (
+    "Traders in the area said the market would remain open while the state government "
+    "finalises compensation for affected shop owners. Commuters were advised to plan ahead. "
+)
+THREATS = ("Excavation", "Road Grading", "Drainage Works", "Bridge Construction")
+
+
+@dataclass
+class StubSettings:
+    latency: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_LATENCY))
+    errors: Dict[str, float] = field(default_factory=dict)  # provider -> failure probability
+    results_per_zone: int = 3
+    article_paragraphs: int = 12
+    seed: int = 7
+    calls: Dict[str, int] = field(default_factory=lambda: {p: 0 for p in PROVIDERS})
+
+
+def parse_pairs(text: Optional[str]) -> Dict[str, float]:
+    """'openai=1.5,jina=0.2' -> {'openai': 1.5, 'jina': 0.2}"""
+    pairs = {}
+    for item in filter(None, (text or "").split(",")):
+        name, _, value = item.partition("=")
+        if name.strip() not in PROVIDERS:
+            raise ValueError(f"Unknown provider '{name}' (expected one of {', '.join(PROVIDERS)})")
+        pairs[name.strip()] = float(value)
+    return pairs
+
+
+def _stable_random(*parts) -> random.Random:
+    return random.Random(hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest())
+
+
+def create_stub_app(settings: StubSettings) -> FastAPI:
+    app = FastAPI(title="Sentinel provider stubs")
+    rng = random.Random(settings.seed)
+
+    async def simulate(provider: str) -> bool:
+        """Sleeps for the provider's latency (±20%); returns True if this call should fail."""
+        settings.calls[provider] += 1
+        delay = settings.latency.get(provider, 0)
+        if delay:
+            await asyncio.sleep(delay * rng.uniform(0.8, 1.2))
+        return rng.random() < settings.errors.get(provider, 0)
+
+    @app.post("/tavily/search")
+    async def tavily_search(request: Request):
+        body = await request.json()
+        if await simulate("tavily"):
+            return JSONResponse({"detail": "stub failure"}, status_code=500)
+        zone = (re.findall(r'"([^"]+)"', body.get("query", "")) or ["Lagos"])[0]
+        slug = re.sub(r"[^a-z0-9]+", "-", zone.lower()).strip("-")
+        results = [
+            {
+                "url": f"https://punchng.com/news/{slug}-works-{i}",
+                "title": f"Road expansion and excavation begin on {zone} ({i})",
+                "content": f"Excavation works begin on {zone}, Nigeria, near fiber cable routes.",
+                "published_date": "2025-01-0" + str(1 + i % 9),
+                "score": 0.9,
+            }
+            for i in range(min(body.get("max_results", 5), settings.results_per_zone))
+        ]
+        return {"query": body.get("query"), "results": results, "response_time": settings.latency.get("tavily", 0)}
+
+    @app.get("/jina/{target:path}")
+    async def jina_reader(target: str):
+        if await simulate("jina"):
+            return PlainTextResponse("stub failure", status_code=503)
+        zone = target.rsplit("/", 1)[-1].rsplit("-works-", 1)[0].replace("-", " ").title()
+        paragraphs = [
+            (ARTICLE_PARAGRAPH if i % 3 == 0 else FILLER_PARAGRAPH).format(zone=zone)
+            for i in range(settings.article_paragraphs)
+        ]
+        return PlainTextResponse(f"Title: {zone} works\n\n" + "\n\n".join(paragraphs))
+
+    @app.post("/openai/v1/chat/completions")
+    async def openai_chat(request: Request):
+        body = await request.json()
+        if await simulate("openai"):
+            return JSONResponse({"error": {"message": "stub failure", "type": "server_error"}}, status_code=500)
+        user = next((m["content"] for m in body.get("messages", []) if m.get("role") == "user"), "")
+        zone = user.split("\n", 1)[0].removeprefix("Zone: ").strip()
+        risks = []
+        for url in re.findall(r"^URL: (\S+)", user, flags=re.MULTILINE):
+            r = _stable_random(zone, url)
+            score = r.randint(3, 9)
+            risks.append({
+                "risk_level": "High" if score >= 7 else "Medium" if score >= 4 else "Low",
+                "risk_score": score,
+                "location_identified": f"{zone} km {r.randint(1, 60)}",
+                "threat_type": r.choice(THREATS),
+                "summary": f"Excavation reported on {zone} near fiber ducts.",
+                "recommended_action": "Dispatch a field team to mark the cable route.",
+                "source_url": url,
+                "source_title": f"Works on {zone}",
+                "published_date": "2025-01-01",
+            })
+        content = json.dumps({"risks": risks})
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        return {
+            "id": f"chatcmpl-stub-{settings.calls['openai']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "refusal": None},
+                "finish_reason": "stop",
+                "logprobs": None,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": prompt_tokens + len(content) // 4,
+            },
+        }
+
+    @app.get("/nominatim/search")
+    async def nominatim_search(q: str = ""):
+        if await simulate("nominatim"):
+            return JSONResponse({"error": "stub failure"}, status_code=503)
+        r = _stable_random(q)
+        lat, lng = r.uniform(4.5, 13.5), r.uniform(3.0, 14.0)
+        return [{"lat": f"{lat:.6f}", "lon": f"{lng:.6f}", "display_name": f"{q} (stub)", "place_id": r.randint(1, 10**6)}]
+
+    @app.post("/telegram/bot{token}/sendMessage")
+    async def telegram_send(token: str):
+        if await simulate("telegram"):
+            return JSONResponse({"ok": False, "error_code": 429, "parameters": {"retry_after": 1}}, status_code=429)
+        return {"ok": True, "result": {"message_id": settings.calls["telegram"]}}
+
+    @app.get("/stats")
+    async def stats():
+        return settings.calls
+
+    return app
+
+
+def env_for(base: str) -> Dict[str, str]:
+    """App settings that route every provider to the stub server at base (http://host:port)."""
+    host = base.split("://", 1)[1]
+    return {
+        "TAVILY_BASE_URL": f"{base}/tavily",
+        "TAVILY_API_KEY": "stub",
+        "JINA_READER_BASE": f"{base}/jina",
+        "OPENAI_BASE_URL": f"{base}/openai/v1",
+        "OPENAI_API_KEY": "stub",
+        "NOMINATIM_DOMAIN": f"{host}/nominatim",
+        "NOMINATIM_SCHEME": "http",
+        "TELEGRAM_API_BASE": f"{base}/telegram",
+        "TELEGRAM_TOKEN": "stub",
+        "CHAT_ID": "stub",
+    }
+
+
+class StubServer:
+    """Runs the stub app with uvicorn in a background thread."""
+
+    def __init__(self, settings: StubSettings, host: str = "127.0.0.1", port: int = 0):
+        config = uvicorn.Config(create_stub_app(settings), host=host, port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        sock = self.server.servers[0].sockets[0]
+        host, port = sock.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubServer":
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", help="provider=seconds,... (defaults: realistic)")
+    parser.add_argument("--errors", help="provider=probability,...")
+    args = parser.parse_args(argv)
+
+    settings = StubSettings()
+    settings.latency.update(parse_pairs(args.latency))
+    settings.errors.update(parse_pairs(args.errors))
+    with StubServer(settings, port=args.port) as server:
+        print(f"🧪 Provider stubs on {server.base_url}")
+        for key, value in env_for(server.base_url).items():
+            print(f"  export {key}={value}")
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
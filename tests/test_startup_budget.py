@@ -0,0 +1,31 @@
+"""
+CI gate for the cold-start budgets (same probe as `python -m benchmarks.startup_budget`).
+Budgets come from IMPORT/HEALTH/READY_BUDGET_SECONDS; STARTUP_BUDGET_RUNS sets the sample count.
+
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+import os
+import statistics
+
+import pytest
+
+from benchmarks.startup_budget import HEALTH_BUDGET, IMPORT_BUDGET, READY_BUDGET, measure
+
+RUNS = int(os.getenv("STARTUP_BUDGET_RUNS", "3"))
+
+
+@pytest.fixture(scope="module")
+def samples(tmp_path_factory):
+    database_url = f"sqlite:///{tmp_path_factory.mktemp('startup') / 'startup.sqlite3'}"
+    return [measure(database_url) for _ in range(RUNS)]
+
+
+@pytest.mark.parametrize("stage, budget", [
+    ("import", IMPORT_BUDGET),
+    ("health", HEALTH_BUDGET),
+    ("ready", READY_BUDGET),
+])
+def test_startup_within_budget(samples, stage, budget):
+    median = statistics.median(s[stage] for s in samples)
+    assert median <= budget, f"{stage}: median {median:.2f} s over the {budget:.2f} s budget"